@@ -1,13 +1,20 @@
-import logging.config
-from flask import Flask, g
+import logging
+import os
+import time
+from flask import Flask, g, jsonify, request
 import psycopg2
 
-from api.imports.resource import endpoint as imports
-from api.imports.dbm import DBManager
+from api.imports.resource import endpoint as imports, import_jobs, response_cache
+from api.imports.dbm import DBManager, profiler
+from api.pool import ConnectionPool
+from api import metrics
+from api.logs import setup_logging
 
 import settings
 
-logging.config.fileConfig('logging.conf')
+setup_logging(
+    settings.LOGGING_CONFIG, use_queue=settings.LOGGING_QUEUE, info_sample_rate=settings.LOGGING_INFO_SAMPLE_RATE
+)
 logger = logging.getLogger('api')
 
 
@@ -18,26 +25,91 @@ def connect_to_db(uri):
     return psycopg2.connect(uri)
 
 
+pool = ConnectionPool(
+    settings.DB_URI,
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+    timeout=settings.DB_POOL_TIMEOUT,
+    check=settings.DB_POOL_CHECK,
+    check_idle=settings.DB_POOL_CHECK_IDLE
+)
+import_jobs.init_pool(pool)
+metrics.register_collector(metrics.CacheCollector(response_cache))
+
+
+# endpoints not using database get no connection
+_no_conn_endpoints = {'metrics', 'query_stats'}
+
+
+def _route():
+    return (request.endpoint or 'unknown').rpartition('.')[2]
+
+
+@app.before_request
+def start_metrics():
+    metrics.start_request()
+
+
 @app.before_request
 def create_conn():
-    if 'conn' not in g:
-        logger.info(f'Getting connection')
-        g.conn = connect_to_db(settings.DB_URI)
+    if 'conn' not in g and request.endpoint not in _no_conn_endpoints:
+        logger.debug('Getting connection')
+        start = time.perf_counter()
+        g.conn = pool.getconn()
+        metrics.observe_acquire(time.perf_counter() - start)
+
+
+@app.after_request
+def remember_status(resp):
+    g.metrics_response = resp.status_code, resp.content_length
+    return resp
+
+
+@app.teardown_request
+def finish_metrics(exc):
+    # streamed responses are torn down after the last chunk is sent
+    status, response_size = g.pop('metrics_response', (500, None))
+    metrics.finish_request(_route(), request.method, status, request.content_length, response_size)
 
 
 @app.teardown_appcontext
 def teardown_conn(exc):
     conn = g.pop('conn', None)
     if conn is not None:
-        logger.info(f'Closing connection')
-        conn.commit()
-        conn.close()
+        logger.debug('Returning connection')
+        try:
+            if exc is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        except psycopg2.Error:
+            pool.putconn(conn, close=True)
+        else:
+            pool.putconn(conn)
+
+
+@app.route('/metrics', methods=['GET'], endpoint='metrics')
+def metrics_view():
+    body, content_type = metrics.exposition()
+    return app.response_class(body, content_type=content_type)
+
+
+@app.route('/stats/queries', methods=['GET'])
+def query_stats():
+    # stats of this worker process only
+    return jsonify(profiler.stats.snapshot() if profiler is not None else {})
 
 
 app.register_blueprint(imports)
-dbm = DBManager()
-with app.app_context():
-    g.conn = connect_to_db(settings.DB_URI)
-    dbm.init_database()
+with connect_to_db(settings.DB_URI) as conn:
+    DBManager(conn).init_database()
+conn.close()
+
+try:
+    import uwsgi
+    uwsgi.atexit = lambda: metrics.mark_process_dead(os.getpid())
+except ImportError:
+    pass
 
 application = app
@@ -0,0 +1,168 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """In-process LRU storage bounded by total size of values in bytes."""
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._items = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self._max_bytes:
+            return
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+
+            while self._size > self._max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self._counters['evictions'] = self._counters.get('evictions', 0) + 1
+
+    def delete(self, key):
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is not None:
+                self._size -= len(value)
+
+    def incr(self, counter):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, items=len(self._items), bytes=self._size)
+
+
+class UwsgiBackend:
+    """
+    Storage in uWSGI cache shared by all workers. Cache and counters must be
+    declared in app.ini (`cache2`, `metric`), uWSGI purges LRU items itself.
+    """
+    _counters = ('hits', 'misses')
+
+    def __init__(self, name):
+        import uwsgi
+
+        self._uwsgi = uwsgi
+        self._name = name
+
+    def get(self, key):
+        return self._uwsgi.cache_get(key, self._name)
+
+    def set(self, key, value):
+        self._uwsgi.cache_update(key, value, 0, self._name)
+
+    def delete(self, key):
+        self._uwsgi.cache_del(key, self._name)
+
+    def incr(self, counter):
+        self._uwsgi.metric_inc(f'{self._name}.{counter}')
+
+    def stats(self):
+        return {counter: self._uwsgi.metric_get(f'{self._name}.{counter}') for counter in self._counters}
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        ...
+
+    def delete(self, key):
+        ...
+
+    def incr(self, counter):
+        ...
+
+    def stats(self):
+        return {}
+
+
+class ResponseCache:
+    """
+    Serialized responses of read endpoints keyed by (endpoint, import_id, import_version).
+    PATCH bumps import version, so stale entries are never read again and are
+    dropped by `invalidate`. Responses of `expiring` endpoints are stored with
+    the date they stop being valid on and are not returned from that date on.
+    """
+    _until_size = len(date.max.isoformat())
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._endpoints = {}
+
+    def key(self, endpoint, import_id, version):
+        return f'{endpoint}:{import_id}:{version}'
+
+    def register(self, endpoint, expiring=False):
+        self._endpoints[endpoint] = expiring
+
+    def get(self, endpoint, import_id, version):
+        return self.get_until(endpoint, import_id, version)[0]
+
+    def get_until(self, endpoint, import_id, version):
+        """(value, valid_until), valid_until is None for not expiring endpoints."""
+        key = self.key(endpoint, import_id, version)
+        value, valid_until = self._backend.get(key), None
+        if value is not None and self._endpoints.get(endpoint):
+            valid_until = date.fromisoformat(value[:self._until_size].decode())
+            value = value[self._until_size:]
+            if date.today() >= valid_until:
+                self._backend.delete(key)
+                value, valid_until = None, None
+
+        self._backend.incr('hits' if value is not None else 'misses')
+        return value, valid_until
+
+    def set(self, endpoint, import_id, version, value, valid_until=None):
+        if self._endpoints.get(endpoint):
+            value = (valid_until or date.max).isoformat().encode() + value
+        self._backend.set(self.key(endpoint, import_id, version), value)
+
+    def invalidate(self, import_id, version):
+        for endpoint in self._endpoints:
+            self._backend.delete(self.key(endpoint, import_id, version))
+
+    def stats(self):
+        return self._backend.stats()
+
+
+def create_cache(backend='auto', max_bytes=64 * 1024 * 1024, name='responses'):
+    """Backend is one of 'auto', 'uwsgi', 'local', 'none'. 'auto' prefers uWSGI cache when running under uWSGI."""
+    if backend == 'auto':
+        try:
+            import uwsgi
+        except ImportError:
+            backend = 'local'
+        else:
+            backend = 'uwsgi'
+
+    logger.info('Response cache backend=%s', backend)
+    if backend == 'uwsgi':
+        return ResponseCache(UwsgiBackend(name))
+    elif backend == 'local':
+        return ResponseCache(LocalBackend(max_bytes))
+    return ResponseCache(NullBackend())
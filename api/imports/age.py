@@ -0,0 +1,72 @@
+import calendar
+import math
+from datetime import date
+from itertools import groupby
+
+
+PERCENTILES = (('p50', 0.5), ('p75', 0.75), ('p99', 0.99))
+
+
+def full_years(birth_date, today):
+    """Same as extract(year from age(today, birth_date)), born on Feb 29 get older on Mar 1."""
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def birthday(birth_date, year):
+    """Day of `year` on which citizen gets older: Mar 1 for born on Feb 29 in non leap years."""
+    if (birth_date.month, birth_date.day) == (2, 29) and not calendar.isleap(year):
+        return date(year, 3, 1)
+    return date(year, birth_date.month, birth_date.day)
+
+
+def next_age_change(birth_dates, today):
+    """First day after today on which age of any citizen changes, None without citizens."""
+    res = None
+    for month_day in {(birth_date.month, birth_date.day) for birth_date in birth_dates}:
+        birth_date = date(2000, *month_day)
+        change = birthday(birth_date, today.year)
+        if change <= today:
+            change = birthday(birth_date, today.year + 1)
+        if res is None or change < res:
+            res = change
+    return res
+
+
+def percentile_cont(values, count, fraction):
+    """
+    percentile_cont of `count` values given as ascending (value, repeats)
+    pairs, with the same linear interpolation as PostgreSQL.
+    """
+    position = fraction * (count - 1)
+    first, second = math.floor(position), math.ceil(position)
+
+    low = high = None
+    seen = 0
+    for value, repeats in values:
+        seen += repeats
+        if low is None and first < seen:
+            low = value
+        if second < seen:
+            high = value
+            break
+    return low + (position - first) * (high - low)
+
+
+def town_percentiles(histogram, today):
+    """
+    Age percentiles per town from (town, birth_date, citizens) rows ordered
+    by town and descending birth date.
+    """
+    res = []
+    for town, rows in groupby(histogram, key=lambda row: row[0]):
+        # ages of adjacent birth dates often coincide, merge them
+        ages = []
+        for age, age_rows in groupby(rows, key=lambda row: full_years(row[1], today)):
+            ages.append((float(age), sum(row[2] for row in age_rows)))
+
+        count = sum(repeats for _, repeats in ages)
+        town_res = {'town': town}
+        for name, fraction in PERCENTILES:
+            town_res[name] = percentile_cont(ages, count, fraction)
+        res.append(town_res)
+    return res
@@ -1,21 +1,43 @@
+import io
 import logging
-from psycopg2.extras import execute_values, RealDictCursor
+import sys
+from psycopg2.extras import execute_values, RealDictCursor, Json
 from flask import g
 
+from api.profiling import QueryProfiler
+from api import metrics
+import settings
+
 
 logger = logging.getLogger(__name__)
 
+profiler = QueryProfiler(
+    slow_seconds=settings.SLOW_QUERY_MS / 1000 if settings.SLOW_QUERY_MS >= 0 else None,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    on_query=metrics.observe_query
+) if settings.QUERY_PROFILING else None
+
 
 class DBManager:
     _schema = 'imports'
+    _citizen_fields = ('town', 'street', 'building', 'apartment', 'name', 'birth_date', 'gender')
 
-    def __init__(self, connection=None):
+    def __init__(self, connection=None, copy_threshold=None, profiler=profiler):
         self._connection = connection if connection else None
+        self._copy_threshold = copy_threshold
+        self._profiler = profiler
 
     @property
     def connection(self):
-        self._connection = g.conn
-        return self._connection
+        if self._connection is not None:
+            return self._connection
+        return g.conn
+
+    def _cursor(self, **kwargs):
+        # queries are profiled under name of the calling method
+        if self._profiler is None:
+            return self.connection.cursor(**kwargs)
+        return self._profiler.cursor(self.connection, sys._getframe(1).f_code.co_name, **kwargs)
 
     # schemas, tables etc initialization
     def init_database(self):
@@ -23,12 +45,17 @@ class DBManager:
         self._init_import_id_sequence()
         self._init_table_citizen()
         self._init_table_relation()
+        self._init_table_import()
+        self._init_table_birthday()
+        self._init_table_job()
+        self._init_table_age_histogram()
+        self._init_indexes()
 
     def _init_schema_imports(self):
         query = f"""
             create schema if not exists {self._schema}
         """
-        with self.connection.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(query)
         # print('schema created')
 
@@ -36,7 +63,7 @@ class DBManager:
         query = f"""
             create sequence if not exists {self._schema}.import_id
         """
-        with self.connection.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(query)
         # print('sequence created')
 
@@ -57,7 +84,7 @@ class DBManager:
             )
 
         """
-        with self.connection.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(query)
         # print('table citizen created')
 
@@ -73,17 +100,173 @@ class DBManager:
             )
 
         """
-        with self.connection.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(query)
         # print('table relation created')
 
+    def _init_table_import(self):
+        if self._table_exists('import'):
+            return
+
+        query = f"""
+            create table {self._schema}.import (
+                import_id integer,
+                created_at timestamptz default now(),
+                citizen_count integer,
+                version integer default 0,
+
+                primary key (import_id)
+            )
+
+        """
+        # imports loaded before registry was introduced
+        query_fill = f"""
+            insert into {self._schema}.import (import_id, citizen_count)
+            select import_id, count(*)
+            from {self._schema}.citizen
+            group by import_id
+        """
+        with self._cursor() as cur:
+            cur.execute(query)
+            cur.execute(query_fill)
+
+    def _init_table_birthday(self):
+        if self._table_exists('birthday'):
+            return
+
+        query = f"""
+            create table {self._schema}.birthday (
+                import_id integer,
+                month integer,
+                citizen_id integer,
+                presents integer,
+
+                primary key (import_id, month, citizen_id)
+            )
+
+        """
+        query_fill = f"""
+            insert into {self._schema}.birthday (import_id, month, citizen_id, presents)
+            {self._birthdays_query('true')}
+        """
+        with self._cursor() as cur:
+            cur.execute(query)
+            cur.execute(query_fill)
+
+    def _init_table_job(self):
+        query = f"""
+            create table if not exists {self._schema}.job (
+                job_id serial,
+                state varchar default 'queued',
+                created_at timestamptz default now(),
+                updated_at timestamptz default now(),
+                citizens_validated integer default 0,
+                citizens_inserted integer default 0,
+                import_id integer,
+                errors jsonb,
+
+                primary key (job_id)
+            )
+
+        """
+        with self._cursor() as cur:
+            cur.execute(query)
+
+    def _init_table_age_histogram(self):
+        if self._table_exists('age_histogram'):
+            return
+
+        query = f"""
+            create table {self._schema}.age_histogram (
+                import_id integer,
+                town varchar,
+                birth_date date,
+                citizens integer,
+
+                primary key (import_id, town, birth_date)
+            )
+
+        """
+        query_fill = f"""
+            insert into {self._schema}.age_histogram (import_id, town, birth_date, citizens)
+            {self._age_histogram_query('true')}
+        """
+        with self._cursor() as cur:
+            cur.execute(query)
+            cur.execute(query_fill)
+
+    def _age_histogram_query(self, condition):
+        # citizens per town and birth date, filtered by condition on citizen
+        return f"""
+            select import_id, town, birth_date, count(*) as citizens
+            from {self._schema}.citizen
+            where {condition}
+            group by import_id, town, birth_date
+        """
+
+    def _init_indexes(self):
+        # active relations of import by citizen: relatives of citizens, birthdays, PATCH state
+        query_relation = f"""
+            create index if not exists relation_active_idx
+            on {self._schema}.relation (import_id, citizen_id)
+            include (relative)
+            where is_active
+        """
+        # towns and birth dates of import for age percentiles
+        query_citizen = f"""
+            create index if not exists citizen_town_birth_date_idx
+            on {self._schema}.citizen (import_id, town, birth_date)
+        """
+        with self._cursor() as cur:
+            cur.execute(query_relation)
+            cur.execute(query_citizen)
+
+    def _birthdays_query(self, condition, relation=None, birth_date=None):
+        # presents per citizen and month of relatives birthdays, filtered by condition on relation r,
+        # birth_date is expression of relative birth date if it is not yet in citizen c
+        relation = relation or f'{self._schema}.relation'
+        birth_date = birth_date or 'c.birth_date'
+        return f"""
+            select
+                r.import_id,
+                extract(month from {birth_date})::integer as month,
+                r.citizen_id,
+                count(r.relative) as presents
+            from {relation} r
+            inner join {self._schema}.citizen c
+                on c.import_id = r.import_id and c.citizen_id = r.relative
+            where r.is_active and {condition}
+            group by r.import_id, month, r.citizen_id
+        """
+
+    def _table_exists(self, table):
+        query = 'select to_regclass(%s) is not null as exists'
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (f'{self._schema}.{table}',))
+            res = cur.fetchone()
+        return res['exists']
+
     # endpoint1: post citizens
     def insert_citizens(self, citizens):
-        import_id = self._get_next_import_id()
+        import_id = self.get_next_import_id()
+        self.insert_citizens_batch(import_id, citizens)
+        self.complete_import(import_id, len(citizens))
+
+        logger.info('import document inserted import_id=%s', import_id)
+        return {'import_id': import_id}
+
+    def insert_citizens_batch(self, import_id, citizens):
+        copy_threshold = settings.COPY_THRESHOLD if self._copy_threshold is None else self._copy_threshold
+        if len(citizens) >= copy_threshold:
+            self._insert_citizens_copy(import_id, citizens)
+        else:
+            self._insert_citizens_values(import_id, citizens)
+
+    def _insert_citizens_values(self, import_id, citizens):
         citizen_values, relation_values = self._insert_citizens_data_transform(citizens, import_id)
 
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            logger.info(f'inserting citizens import_id={import_id}')
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            logger.debug('inserting citizens import_id=%s', import_id)
             query = f"""
                 insert into {self._schema}.citizen (
                     import_id,
@@ -111,7 +294,7 @@ class DBManager:
                 )'''
             execute_values(cur, query, citizen_values, template=template)
 
-            logger.info(f'inserting relations import_id={import_id}')
+            logger.debug('inserting relations import_id=%s', import_id)
             query = f"""
                 insert into {self._schema}.relation (
                     import_id,
@@ -129,13 +312,86 @@ class DBManager:
                 )'''
             execute_values(cur, query, relation_values, template=template)
 
-        logger.info(f'import document inserted import_id={import_id}')
-        return {'import_id': import_id}
+    def _insert_citizens_copy(self, import_id, citizens):
+        citizen_rows, relation_rows = io.StringIO(), io.StringIO()
+        escape = self._copy_escape
+        for citizen in citizens:
+            day, month, year = citizen['birth_date'].split('.')
+            citizen_rows.write(
+                f"{import_id}\t{citizen['citizen_id']}\t{escape(citizen['town'])}\t"
+                f"{escape(citizen['street'])}\t{escape(citizen['building'])}\t{citizen['apartment']}\t"
+                f"{escape(citizen['name'])}\t{year.zfill(4)}-{month}-{day}\t{escape(citizen['gender'])}\n"
+            )
+            for relative in citizen['relatives']:
+                relation_rows.write(f"{import_id}\t{citizen['citizen_id']}\t{relative}\tt\n")
 
-    def _get_next_import_id(self):
+        citizen_rows.seek(0)
+        relation_rows.seek(0)
+        with self._cursor() as cur:
+            logger.debug('copying citizens import_id=%s', import_id)
+            query = f"""
+                copy {self._schema}.citizen (
+                    import_id,
+                    citizen_id,
+                    town,
+                    street,
+                    building,
+                    apartment,
+                    name,
+                    birth_date,
+                    gender
+                )
+                from stdin
+            """
+            cur.copy_expert(query, citizen_rows)
+
+            logger.debug('copying relations import_id=%s', import_id)
+            query = f"""
+                copy {self._schema}.relation (
+                    import_id,
+                    citizen_id,
+                    relative,
+                    is_active
+                )
+                from stdin
+            """
+            cur.copy_expert(query, relation_rows)
+
+    @staticmethod
+    def _copy_escape(value):
+        # COPY text format: backslash, tab and line breaks must be escaped
+        if '\\' in value or '\t' in value or '\n' in value or '\r' in value:
+            value = value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+        return value
+
+    def complete_import(self, import_id, citizen_count):
+        """Register inserted import and build its aggregates."""
+        logger.debug('registering import import_id=%s', import_id)
+        query = f"""
+            insert into {self._schema}.import (import_id, citizen_count)
+            values (%(import_id)s, %(citizen_count)s)
+        """
+        query_birthdays = f"""
+            insert into {self._schema}.birthday (import_id, month, citizen_id, presents)
+            {self._birthdays_query('r.import_id = %(import_id)s')}
+        """
+        query_age = f"""
+            insert into {self._schema}.age_histogram (import_id, town, birth_date, citizens)
+            {self._age_histogram_query('import_id = %(import_id)s')}
+        """
+        values = {'import_id': import_id, 'citizen_count': citizen_count}
+        with self._cursor() as cur:
+            cur.execute(query, values)
+            cur.execute(query_birthdays, values)
+            cur.execute(query_age, values)
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def get_next_import_id(self):
         # fetchone
         query = f'select nextval(\'{self._schema}.import_id\') as import_id'
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query)
             import_id = cur.fetchone()['import_id']
         return import_id
@@ -169,61 +425,214 @@ class DBManager:
         flatten = lambda lst: [item for sublist in lst for item in sublist]
         return flatten(relations_data)
 
-    def update_citizen(self, citizen_info):
-        with self.connection.cursor() as cur:
-            query = f"""
-                update {self._schema}.citizen
-                    set 
-                        town = %(town)s,
-                        street = %(street)s,
-                        building = %(building)s,
-                        apartment = %(apartment)s,
-                        name = %(name)s,
-                        birth_date = to_date(%(birth_date)s, 'DD.MM.YYYY'),
-                        gender = %(gender)s
+    def lock_import(self, import_id):
+        """
+        Lock import row and bump its version, the first statement of PATCH.
+        Concurrent PATCHes of the import wait for each other here, so state read
+        after it is current. Returns new version or None if there is no such import.
+        """
+        # fetchone
+        query = f"""
+            update {self._schema}.import
+                set version = version + 1
+                where import_id = %(import_id)s
+                returning version
+        """
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, {'import_id': import_id})
+            res = cur.fetchone()
+        return res['version'] if res else None
+
+    def update_citizen(self, import_id, citizen_id, fields, old_town, old_birth_date,
+                       added=(), removed=(), birthday_citizen_ids=()):
+        """
+        Update given fields and relatives diff of citizen in one statement.
+        If town or birth date changes, citizen is moved from (`old_town`, `old_birth_date`)
+        bucket of age histogram. Both sides of every relation are switched on for `added`
+        and off for `removed`. Birthdays aggregate rows of `birthday_citizen_ids` are recomputed.
+        Import is expected to be locked by `lock_import`. Returns citizen row without relatives.
+        """
+        relations = {}
+        for relatives, is_active in ((removed, False), (added, True)):
+            for relative in relatives:
+                relations[(citizen_id, relative)] = is_active
+                relations[(relative, citizen_id)] = is_active
+        citizen_ids, relatives = zip(*relations.keys()) if relations else ((), ())
+
+        values = dict(
+            fields,
+            import_id=import_id,
+            citizen_id=citizen_id,
+            old_town=old_town,
+            old_birth_date=old_birth_date,
+            citizen_ids=list(citizen_ids),
+            relatives=list(relatives),
+            is_active=list(relations.values()),
+            birthday_citizen_ids=list(birthday_citizen_ids)
+        )
+        sets = ',\n'.join(
+            f'{field} = ' + (
+                f"to_date(%({field})s, 'DD.MM.YYYY')" if field == 'birth_date' else f'%({field})s'
+            )
+            for field in self._citizen_fields if field in fields
+        )
+        if sets:
+            # emptied buckets are kept with zero citizens
+            ctes = [f"""
+                citizen as (
+                    update {self._schema}.citizen
+                        set {sets}
+                        where
+                            import_id = %(import_id)s
+                            and citizen_id = %(citizen_id)s
+                        returning *
+                ),
+                age_moved as (
+                    select import_id, town, birth_date
+                    from citizen
+                    where (town, birth_date) <> (%(old_town)s, to_date(%(old_birth_date)s, 'DD.MM.YYYY'))
+                ),
+                age_dec as (
+                    update {self._schema}.age_histogram
+                        set citizens = citizens - 1
+                        where
+                            import_id = %(import_id)s
+                            and town = %(old_town)s
+                            and birth_date = to_date(%(old_birth_date)s, 'DD.MM.YYYY')
+                            and exists (select 1 from age_moved)
+                ),
+                age_inc as (
+                    insert into {self._schema}.age_histogram (import_id, town, birth_date, citizens)
+                    select import_id, town, birth_date, 1
+                    from age_moved
+                    on conflict (import_id, town, birth_date)
+                    do update
+                        set citizens = age_histogram.citizens + 1
+                )
+            """]
+        else:
+            ctes = [f"""
+                citizen as (
+                    select *
+                    from {self._schema}.citizen
                     where
                         import_id = %(import_id)s
                         and citizen_id = %(citizen_id)s
-            """  # TODO: why insert ... on conflict do update?
-            cur.execute(query, citizen_info)
-
-    def update_relation(self, relation):
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            query = f"""
-                insert into {self._schema}.relation (
-                    import_id,
-                    citizen_id,
-                    relative,
-                    is_active
-                ) 
-                values (
-                    %(import_id)s,
-                    %(citizen_id)s, 
-                    %(relative)s, 
-                    %(is_active)s
                 )
-                on conflict (import_id, citizen_id, relative)
+            """]
+
+        # statement does not see its own updates, so birthdays are computed
+        # from relations and birth date as they become
+        relation = None
+        if relations:
+            relation = 'relation_after'
+            ctes.append(f"""
+                changed as (
+                    select r.citizen_id, r.relative, r.is_active
+                    from unnest(
+                        %(citizen_ids)s::integer[],
+                        %(relatives)s::integer[],
+                        %(is_active)s::boolean[]
+                    ) as r(citizen_id, relative, is_active)
+                ),
+                upserted as (
+                    insert into {self._schema}.relation (
+                        import_id,
+                        citizen_id,
+                        relative,
+                        is_active
+                    )
+                    select %(import_id)s, citizen_id, relative, is_active
+                    from changed
+                    on conflict (import_id, citizen_id, relative)
+                    do update
+                        set is_active = excluded.is_active
+                ),
+                relation_after as (
+                    select r.import_id, r.citizen_id, r.relative, r.is_active
+                    from {self._schema}.relation r
+                    where
+                        r.import_id = %(import_id)s
+                        and r.citizen_id = any(%(birthday_citizen_ids)s)
+                        and r.is_active
+                        and not exists (
+                            select 1 from changed ch
+                            where ch.citizen_id = r.citizen_id and ch.relative = r.relative
+                        )
+                    union all
+                    select %(import_id)s::integer, citizen_id, relative, is_active
+                    from changed
+                    where is_active
+                )
+            """)
+        if birthday_citizen_ids:
+            birth_date = None
+            if 'birth_date' in fields:
+                birth_date = (
+                    "case when c.citizen_id = %(citizen_id)s "
+                    "then to_date(%(birth_date)s, 'DD.MM.YYYY') else c.birth_date end"
+                )
+            ctes.append(self._refresh_birthdays_query(relation, birth_date))
+
+        query = f"""
+            with {','.join(ctes)}
+            select
+                citizen_id,
+                town,
+                street,
+                building,
+                apartment,
+                name,
+                to_char(birth_date, 'DD.MM.YYYY') as birth_date,
+                gender
+            from citizen
+        """
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, values)
+            res = cur.fetchone()
+        return res
+
+    def _refresh_birthdays_query(self, relation=None, birth_date=None):
+        # CTEs replacing birthdays rows of %(birthday_citizen_ids)s by ones computed from relation
+        fresh = self._birthdays_query(
+            'r.import_id = %(import_id)s and r.citizen_id = any(%(birthday_citizen_ids)s)', relation, birth_date
+        )
+        return f"""
+            fresh as (
+                {fresh}
+            ),
+            stale as (
+                delete from {self._schema}.birthday b
+                where
+                    b.import_id = %(import_id)s
+                    and b.citizen_id = any(%(birthday_citizen_ids)s)
+                    and not exists (
+                        select 1 from fresh f
+                        where f.month = b.month and f.citizen_id = b.citizen_id
+                    )
+            ),
+            refreshed as (
+                insert into {self._schema}.birthday (import_id, month, citizen_id, presents)
+                select import_id, month, citizen_id, presents
+                from fresh
+                on conflict (import_id, month, citizen_id)
                 do update
-                    set 
-                        import_id = %(import_id)s,
-                        citizen_id = %(citizen_id)s,
-                        relative = %(relative)s,
-                        is_active = %(is_active)s
-            """
-            cur.execute(query, relation)
+                    set presents = excluded.presents
+            )
+        """
 
     # endpoint 3: get citizens
-    def get_citizens(self, import_id):
-        query = f"""
+    def _citizens_query(self):
+        return f"""
             with c as (
                 select * 
                 from {self._schema}.citizen
-                where import_id = {import_id}
+                where import_id = %(import_id)s
             ),
             r as (
                 select citizen_id, array_agg(relative) as relatives
                 from {self._schema}.relation
-                where import_id = {import_id} and is_active
+                where import_id = %(import_id)s and is_active
                 group by citizen_id 
             ),
             c_full as (
@@ -248,168 +657,138 @@ class DBManager:
                 end
             from c_full 
         """
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query)
+
+    def get_citizens(self, import_id):
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(self._citizens_query(), {'import_id': import_id})
             res = cur.fetchall()
         return res
 
-    def get_citizen(self, import_id, citizen_id):
+    def get_citizens_json(self, import_id):
+        """Whole {"data": [...]} document of citizens built by PostgreSQL as text."""
         # fetchone
         query = f"""
-            with c as (
-                select * 
-                from {self._schema}.citizen
-                where import_id = {import_id} and citizen_id = {citizen_id}
-            ),
-            r as (
-                select citizen_id, array_agg(relative) as relatives
-                from {self._schema}.relation
-                where import_id = {import_id} and citizen_id = {citizen_id} and is_active
-                group by citizen_id
-            ),
-            c_full as (
-                select 
-                    c.*,
-                    r.relatives
-                from c
-                left join r using(citizen_id)
-            )
-            select 
-                citizen_id, 
-                town, 
-                street, 
-                building,
-                apartment, 
-                name, 
-                to_char(birth_date, 'DD.MM.YYYY') as birth_date, 
-                gender, 
-                case
-                    when relatives is null then array[]::integer[]
-                    else relatives
-                end
-            from c_full
+            select '{{"data": [' || coalesce(string_agg(row_to_json(c)::text, ','), '') || ']}}' as data
+            from ({self._citizens_query()}) c
         """
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query)
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, {'import_id': import_id})
             res = cur.fetchone()
-        return res
+        return res['data']
+
+    def iter_citizens(self, import_id, itersize=2000):
+        """Yield citizens of import fetched by server side cursor in chunks of `itersize` rows."""
+        with self._cursor(name=f'citizens_{import_id}', cursor_factory=RealDictCursor) as cur:
+            cur.itersize = itersize
+            cur.execute(self._citizens_query(), {'import_id': import_id})
+            yield from cur
 
-    def get_citizen_ids(self, import_id):
+    def get_patch_state(self, import_id, citizen_id, citizen_ids):
+        """
+        Everything PATCH needs to know before update: which of `citizen_ids` exist
+        in import, current relatives, town and birth date of citizen.
+        Read after `lock_import`, so concurrent PATCHes of the import are already committed.
+        """
         # fetchone
         query = f"""
-            select array_agg(distinct(citizen_id)) as citizen_ids
-            from {self._schema}.citizen
-            where import_id = {import_id}
+            select
+                array(
+                    select citizen_id
+                    from {self._schema}.citizen
+                    where import_id = %(import_id)s and citizen_id = any(%(citizen_ids)s)
+                ) as citizen_ids,
+                array(
+                    select relative
+                    from {self._schema}.relation
+                    where import_id = %(import_id)s and citizen_id = %(citizen_id)s and is_active
+                ) as relatives,
+                c.town,
+                to_char(c.birth_date, 'DD.MM.YYYY') as birth_date
+            from (select 1) as one
+            left join {self._schema}.citizen c
+                on c.import_id = %(import_id)s and c.citizen_id = %(citizen_id)s
         """
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query)
+        values = {
+            'import_id': import_id,
+            'citizen_id': citizen_id,
+            'citizen_ids': list(citizen_ids)
+        }
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, values)
             res = cur.fetchone()
         return res
 
     # endpoint 4: get birthdays
     def get_birthdays(self, import_id):
-        # fetchone
         query = f"""
-            with bday as (
-                select citizen_id as relative, birth_date
-                from {self._schema}.citizen
-                where import_id = {import_id}
-            ),
-            rel as (
-                select citizen_id, relative
-                from {self._schema}.relation
-                where import_id = {import_id} and is_active
-            ),
-            bdays as (
-                select 
-                    r.citizen_id, 
-                    r.relative, 
-                    extract(month from b.birth_date) as month
-                from rel as r
-                inner join bday b using(relative)
-            ),
-            bdays_by_citizen as (
-                select 
-                    b.month, 
-                    b.citizen_id, 
-                    count(b.relative) as presents
-                from bdays as b
-                group by b.month, b.citizen_id
-            ),
-            bdays_json as (
-                select 
-                    month, 
-                    json_build_object('citizen_id', citizen_id, 'presents', presents) AS data
-                from bdays_by_citizen
-            ),
-            bdays_grouped as (
-                select 
-                    month::integer, 
-                    array_agg(data) as data
-                from bdays_json
-                group by month
-            ),
-            all_months as (
-                select generate_series(1, 12) as month
-            ),
-            all_months_stat as (
-                select 
-                    m.month,
-                    b.data
-                from all_months m
-                left join bdays_grouped b using(month)
-            ),
-            all_months_full_stat as (
-                select 
-                    month,
-                    case 
-                        when data is null then array[]::json[]
-                        else data
-                    end
-                from all_months_stat
-            )
-            select json_object_agg(month, data) as data
-            from all_months_full_stat
+            select month, citizen_id, presents
+            from {self._schema}.birthday
+            where import_id = %s
+            order by month, citizen_id
         """
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query)
-            res = cur.fetchone()
-        return res['data'] # TODO: query returning body of data field
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (import_id,))
+            rows = cur.fetchall()
+
+        res = {str(month): [] for month in range(1, 13)}
+        for row in rows:
+            res[str(row['month'])].append({'citizen_id': row['citizen_id'], 'presents': row['presents']})
+        return res
 
     # endpoint 5: get age
-    def get_age(self, import_id):
-        query = f"""  
-            with age as (
-                select citizen_id, town, extract(year from age(birth_date)) as age 
-                from {self._schema}.citizen
-                where import_id = {import_id}
-            )
-            select 
-                town, 
-                percentile_cont(0.5) within group (order by age) as p50,
-                percentile_cont(0.75) within group (order by age) as p75,
-                percentile_cont(0.99) within group (order by age) as p99
-            from age
-            group by town
-        """
-        #     select
-        #         town,
-        #         round(p50::numeric, 2) as p50,
-        #         round(p75::numeric, 2) as p75,
-        #         round(p99::numeric, 2) as p99
-        #     from age_percentile
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query)
+    def get_age_histogram(self, import_id):
+        """Rows (town, birth_date, citizens) ordered by town and ascending age."""
+        query = f"""
+            select town, birth_date, citizens
+            from {self._schema}.age_histogram
+            where import_id = %s and citizens > 0
+            order by town, birth_date desc
+        """
+        with self._cursor() as cur:
+            cur.execute(query, (import_id,))
             res = cur.fetchall()
         return res
 
-    def get_import_ids(self):
+    def get_import(self, import_id):
         # fetchone
         query = f"""
-            select array_agg(distinct(import_id)) as import_ids
-            from {self._schema}.citizen
+            select import_id, created_at, citizen_count, version
+            from {self._schema}.import
+            where import_id = %s
         """
-        with self.connection.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (import_id,))
+            res = cur.fetchone()
+        return res
+
+    # async imports
+    def create_job(self):
+        query = f'insert into {self._schema}.job default values returning job_id'
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query)
+            job_id = cur.fetchone()['job_id']
+        return job_id
+
+    def update_job(self, job_id, **fields):
+        if 'errors' in fields:
+            fields['errors'] = Json(fields['errors'])
+        set_values = ', '.join(f'{key} = %({key})s' for key in fields)
+        query = f"""
+            update {self._schema}.job
+            set {set_values}, updated_at = now()
+            where job_id = %(job_id)s
+        """
+        with self._cursor() as cur:
+            cur.execute(query, dict(fields, job_id=job_id))
+
+    def get_job(self, job_id):
+        # fetchone
+        query = f"""
+            select job_id, state, created_at, updated_at, citizens_validated, citizens_inserted, import_id, errors
+            from {self._schema}.job
+            where job_id = %s
+        """
+        with self._cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (job_id,))
             res = cur.fetchone()
-        return res['import_ids'] or []
+        return res
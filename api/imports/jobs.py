@@ -0,0 +1,123 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from .dbm import DBManager
+from .service import Service, ImportValidationError
+from .stream import CitizensStream
+from .. import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _job_errors(err):
+    if isinstance(err, ImportValidationError):
+        return err.errors
+    return {'err_type': repr(type(err)), 'message': str(err)}
+
+
+class ImportJobs:
+    """
+    POST /imports?async: payload is validated and inserted by a thread pool
+    of the worker after response is sent. State and progress are kept in
+    imports.job table, so any worker answers GET /imports/jobs/<job_id>.
+    """
+
+    def __init__(self, uri, workers=2):
+        self._uri = uri
+        self._workers = workers
+        self._pool = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_pool(self, pool):
+        self._pool = pool
+
+    def submit(self, body, load, batch_size=1000, report=None):
+        """Register job for raw request `body` and queue it, return job_id."""
+        conn = self._pool.getconn()
+        try:
+            job_id = DBManager(conn).create_job()
+            conn.commit()
+        finally:
+            self._pool.putconn(conn)
+
+        self._get_executor().submit(self._run, job_id, body, load, batch_size, report)
+        logger.info('import job queued job_id=%s', job_id)
+        return job_id
+
+    def _get_executor(self):
+        with self._lock:
+            # threads do not survive fork of uWSGI workers
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix='import-job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _fail_unstarted(self, job_id, err):
+        # pool is exhausted, so failure is recorded through a short-lived connection of its own
+        logger.warning('import job failed to start job_id=%s error=%r', job_id, err)
+        conn = psycopg2.connect(self._uri)
+        try:
+            DBManager(conn).update_job(job_id, state='failed', errors=_job_errors(err))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run(self, job_id, body, load, batch_size, report):
+        conn = status_conn = None
+        validation = metrics.ValidationTimer(load, 'async')
+        try:
+            # progress goes through its own connection to be visible before import is committed
+            try:
+                status_conn = self._pool.getconn()
+            except Exception as err:
+                self._fail_unstarted(job_id, err)
+                return
+            status = DBManager(status_conn)
+
+            def update(**fields):
+                status.update_job(job_id, **fields)
+                status_conn.commit()
+
+            try:
+                conn = self._pool.getconn()
+            except Exception as err:
+                logger.warning('import job failed to start job_id=%s error=%r', job_id, err)
+                update(state='failed', errors=_job_errors(err))
+                return
+
+            update(state='running')
+            dbm = DBManager(conn)
+            try:
+                resp = Service(dbm=dbm).put_citizens_stream(
+                    CitizensStream(io.BytesIO(body)), validation, batch_size, report=report,
+                    progress=lambda validated, inserted: update(
+                        citizens_validated=validated, citizens_inserted=inserted
+                    )
+                )
+                citizen_count = dbm.get_import(resp['import_id'])['citizen_count']
+                conn.commit()
+            except Exception as err:
+                conn.rollback()
+                logger.warning('import job failed job_id=%s error=%r', job_id, err)
+                update(state='failed', errors=_job_errors(err))
+            else:
+                logger.info('import job done job_id=%s import_id=%s', job_id, resp['import_id'])
+                update(
+                    state='done', import_id=resp['import_id'],
+                    citizens_validated=citizen_count, citizens_inserted=citizen_count
+                )
+        except Exception:
+            logger.exception('import job state is lost job_id=%s', job_id)
+        finally:
+            validation.observe()
+            for acquired in (conn, status_conn):
+                if acquired is not None:
+                    self._pool.putconn(acquired)
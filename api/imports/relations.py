@@ -0,0 +1,49 @@
+RELATIVE_NOT_FOUND = 'relative not found in citizen list'
+NOT_TWO_SIDED = 'some relations are not two-sided'
+DUPLICATED_CITIZEN = 'citizen_id is duplicated'
+
+
+class RelationsChecker:
+    """
+    Linear time relations check which can be fed citizen by citizen.
+
+    Errors are (reason, citizen_id, relative) tuples, relative is None
+    for duplicated citizen_id.
+    """
+
+    def __init__(self):
+        self._relatives_by_citizen = {}
+
+    def add(self, citizen_id, relatives):
+        """Register citizen, return duplication error or None."""
+        if citizen_id in self._relatives_by_citizen:
+            return DUPLICATED_CITIZEN, citizen_id, None
+        self._relatives_by_citizen[citizen_id] = set(relatives)
+
+    def errors(self):
+        """Yield every relative missing from the import and every one-sided relation."""
+        relatives_by_citizen = self._relatives_by_citizen
+        for citizen_id, relatives in relatives_by_citizen.items():
+            for relative in relatives:
+                relatives_back = relatives_by_citizen.get(relative)
+                if relatives_back is None:
+                    yield RELATIVE_NOT_FOUND, citizen_id, relative
+                elif citizen_id not in relatives_back:
+                    yield NOT_TWO_SIDED, citizen_id, relative
+
+
+def iter_relation_errors(citizens):
+    """
+    Check relations of import in linear time.
+
+    Yields (reason, citizen_id, relative) for every duplicated citizen_id
+    (relative is None), every relative missing from the import and every
+    relation that has no pair in the opposite direction.
+    """
+    checker = RelationsChecker()
+    for citizen_info in citizens:
+        error = checker.add(citizen_info['citizen_id'], citizen_info['relatives'])
+        if error:
+            yield error
+
+    yield from checker.errors()
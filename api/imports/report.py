@@ -0,0 +1,92 @@
+from .relations import RelationsChecker
+
+
+class ValidationReport:
+    """
+    Up to `limit` errors of an import collected in a single pass over citizens.
+
+    Every error is {'index', 'citizen_id', 'field', 'reason', 'relation'}:
+    position of citizen in payload, its citizen_id if it was loaded, field path
+    like 'relatives.2' and relation pair [citizen_id, relative] for relation
+    errors. Unknown parts are None, payload level errors have no index.
+    """
+
+    def __init__(self, limit=100):
+        self.errors = []
+        self.truncated = False
+        self._limit = limit
+        self._relations = RelationsChecker()
+        self._index_by_citizen = {}
+        self._unchecked = set()
+
+    def __bool__(self):
+        return bool(self.errors)
+
+    def add(self, reason, index=None, citizen_id=None, field=None, relation=None):
+        if len(self.errors) >= self._limit:
+            self.truncated = True
+            return
+        self.errors.append({
+            'index': index, 'citizen_id': citizen_id, 'field': field, 'reason': reason, 'relation': relation
+        })
+
+    def add_import(self, data, errors):
+        """Add schema load result of whole payload, then check relations of loaded citizens."""
+        citizens = (data or {}).get('citizens') or ()
+        citizens_errors = errors.get('citizens')
+        for field, messages in errors.items():
+            # errors of citizens and their duplicates are added per citizen below
+            if field == 'citizens' and (isinstance(messages, dict) or citizens):
+                continue
+            self._add_messages(messages, field=None if field == '_schema' else field)
+
+        citizens_errors = citizens_errors if isinstance(citizens_errors, dict) else {}
+        for index, citizen_info in enumerate(citizens):
+            self.add_citizen(index, citizen_info, citizens_errors.get(index))
+            if self.truncated:
+                return
+        self.check_relations()
+
+    def add_citizen(self, index, citizen_info, errors=None):
+        """Add schema load result of one citizen and register it for relations check."""
+        citizen_id = citizen_info.get('citizen_id') if citizen_info else None
+        if isinstance(errors, dict):
+            for field, messages in errors.items():
+                self._add_messages(messages, index, citizen_id, None if field == '_schema' else field)
+        elif errors:
+            self._add_messages(errors, index, citizen_id)
+
+        if citizen_id is None:
+            return
+
+        relatives = citizen_info.get('relatives')
+        if relatives is None:
+            # relatives are invalid, so relations pointing to this citizen can not be checked
+            self._unchecked.add(citizen_id)
+            relatives = ()
+
+        error = self._relations.add(citizen_id, relatives)
+        if error:
+            self.add(error[0], index, citizen_id, 'citizen_id')
+        else:
+            self._index_by_citizen[citizen_id] = index
+
+    def check_relations(self):
+        for reason, citizen_id, relative in self._relations.errors():
+            if citizen_id in self._unchecked or relative in self._unchecked:
+                continue
+            self.add(reason, self._index_by_citizen[citizen_id], citizen_id, 'relatives', [citizen_id, relative])
+            if self.truncated:
+                return
+
+    def as_dict(self):
+        return {'errors': self.errors, 'truncated': self.truncated}
+
+    def _add_messages(self, messages, index=None, citizen_id=None, field=None):
+        if isinstance(messages, dict):
+            # errors of list items, e.g. {2: ['Not a valid integer.']} for relatives
+            for item, item_messages in messages.items():
+                self._add_messages(item_messages, index, citizen_id, f'{field}.{item}')
+            return
+        for message in messages:
+            self.add(message, index, citizen_id, field)
@@ -1,30 +1,68 @@
+import functools
 import logging
+from datetime import date
 
-from flask import Blueprint, request, jsonify
-from .service import Service, RelationsError, PatchCitizenError, SelectError, ImportIdNotFound
-from .schema import Import as ImportSchema, CitizenPatch as CitizenPatchSchema
+from flask import Blueprint, current_app, request, stream_with_context, url_for
+from werkzeug.exceptions import BadRequest
+from .service import (
+    Service, RelationsError, PatchCitizenError, SelectError, ImportIdNotFound, ImportValidationError, JobNotFound
+)
+from .schema import Import as ImportSchema, CitizenPatch as CitizenPatchSchema, CitizenPost as CitizenPostSchema
+from .stream import CitizensStream, PayloadError
+from .report import ValidationReport
+from .jobs import ImportJobs
+from . import validator
+from ..cache import create_cache
+from .. import metrics
+from ..json_provider import load_backend
+
+import settings
 
 
 logger = logging.getLogger(__name__)
 
 endpoint = Blueprint('imports', __name__, url_prefix='/imports')
 
-import_schema = ImportSchema()
+if settings.IMPORT_VALIDATOR == 'marshmallow':
+    import_schema, citizen_post_schema = ImportSchema(), CitizenPostSchema()
+else:
+    import_schema = validator.Import(
+        workers=settings.VALIDATION_WORKERS, parallel_threshold=settings.VALIDATION_PARALLEL_THRESHOLD,
+        executable=settings.VALIDATION_PYTHON
+    )
+    citizen_post_schema = validator.CitizenPost()
 citizen_schema = CitizenPatchSchema()
-service = Service()
+response_cache = create_cache(
+    settings.RESPONSE_CACHE_BACKEND,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    name=settings.RESPONSE_CACHE_NAME
+)
+service = Service(cache=response_cache)
+import_jobs = ImportJobs(settings.DB_URI, workers=settings.IMPORT_ASYNC_WORKERS)
+_, json_dumps, json_loads = load_backend(settings.JSON_BACKEND)
 
 
 def _jsonify(func):
     def _wrapper(resp):
         res = func(resp)
-        return jsonify(res)
+        return current_app.response_class(json_dumps(res), mimetype='application/json')
 
     return _wrapper
 
 
+def _request_json():
+    """Same as `request.json`, but decoded by selected JSON backend."""
+    if not request.is_json:
+        return None
+    try:
+        return json_loads(request.get_data(cache=False))
+    except ValueError as err:
+        raise BadRequest(f'Failed to decode JSON object: {err}')
+
+
 @_jsonify
 def handle_err(err):
-    logger.warning(f'Error type={repr(type(err))} message={err}')
+    logger.warning('Error type=%r message=%s', type(err), err)
     if isinstance(err, Exception):
         return {'err_type': repr(type(err)), 'message': str(err)}
     elif isinstance(err, str):
@@ -39,10 +77,97 @@ def handle_success(res):
     return {"data": res}
 
 
+def handle_success_raw(body):
+    """Response with {"data": ...} document already serialized elsewhere."""
+    logger.info('Request is successfully handled')
+    return current_app.response_class(body, mimetype='application/json')
+
+
+def handle_success_stream(rows, chunk_size=64 * 1024):
+    """Chunked response with {"data": [...]} envelope built from rows iterator."""
+    def _generate():
+        chunk, size = [b'{"data": ['], 0
+        for i, row in enumerate(rows):
+            item = json_dumps(row)
+            chunk.append(b',' + item if i else item)
+            size += len(item)
+            if size >= chunk_size:
+                yield b''.join(chunk)
+                chunk, size = [], 0
+        chunk.append(b']}')
+        yield b''.join(chunk)
+        logger.info('Request is successfully handled')
+
+    return current_app.response_class(stream_with_context(_generate()), mimetype='application/json')
+
+
+def _cached(expiring=False):
+    """
+    Version GET endpoint by import version: answer 304 to matching If-None-Match
+    and serve serialized response from cache while import version is the same.
+    Views of `expiring` endpoints set `valid_until` date of response, it is a
+    part of ETag and cached response is dropped on that date.
+    """
+    def _decorator(func):
+        response_cache.register(func.__name__, expiring=expiring)
+
+        @functools.wraps(func)
+        def _wrapper(import_id):
+            try:
+                import_info = service.get_import(import_id)
+            except (SelectError, ImportIdNotFound) as err:
+                return handle_err(err), 400
+            version = import_info['version']
+
+            etag = response_cache.key(func.__name__, import_id, version)
+            if not expiring and request.if_none_match.contains_weak(etag):
+                return _not_modified(etag)
+
+            body, valid_until = response_cache.get_until(func.__name__, import_id, version)
+            if body is not None:
+                resp, status = current_app.response_class(body, mimetype='application/json'), 200
+            else:
+                resp, status = func(import_id, import_info)
+                if status != 200:
+                    return resp, status
+                valid_until = getattr(resp, 'valid_until', None) or date.max
+                if not resp.is_streamed:
+                    response_cache.set(func.__name__, import_id, version, resp.get_data(), valid_until)
+
+            if expiring:
+                etag = f'{etag}:{valid_until}'
+                if request.if_none_match.contains_weak(etag):
+                    return _not_modified(etag)
+            resp.set_etag(etag)
+            return resp, status
+
+        return _wrapper
+
+    return _decorator
+
+
+def _not_modified(etag):
+    resp = current_app.response_class(status=304)
+    resp.set_etag(etag)
+    return resp
+
+
 @endpoint.route('', methods=['POST'])
 def imports():
-    data, err = import_schema.load(request.json)
-    if err:
+    report = _validation_report()
+    if 'async' in request.args:
+        return _imports_async(report)
+    if (request.content_length or 0) > settings.IMPORT_STREAM_THRESHOLD:
+        return _imports_stream(report)
+
+    validation = metrics.ValidationTimer(import_schema.load, 'body')
+    data, err = validation(_request_json())
+    validation.observe()
+    if report is not None:
+        report.add_import(data, err)
+        if report or report.truncated:
+            return handle_err(report.as_dict()), 400
+    elif err:
         return handle_err(err), 400
     try:
         resp = service.put_citizens(data)
@@ -52,19 +177,72 @@ def imports():
         return handle_success(resp), 201
 
 
+def _validation_report():
+    """Report of up to ?report=<limit> errors, VALIDATION_REPORT_LIMIT at most. None without ?report."""
+    if 'report' not in request.args:
+        return None
+    limit = request.args.get('report', type=int) or settings.VALIDATION_REPORT_LIMIT
+    return ValidationReport(max(1, min(limit, settings.VALIDATION_REPORT_LIMIT)))
+
+
+def _imports_async(report=None):
+    job_id = import_jobs.submit(request.get_data(), citizen_post_schema.load, settings.IMPORT_STREAM_BATCH_SIZE, report)
+    resp = handle_success({'job_id': job_id})
+    resp.headers['Location'] = url_for('.job', job_id=job_id)
+    return resp, 202
+
+
+def _imports_stream(report=None):
+    citizens = CitizensStream(request.stream)
+    validation = metrics.ValidationTimer(citizen_post_schema.load, 'stream')
+    try:
+        resp = service.put_citizens_stream(citizens, validation, settings.IMPORT_STREAM_BATCH_SIZE, report=report)
+    except ImportValidationError as err:
+        return handle_err(err.errors), 400
+    except PayloadError as err:
+        if report is not None:
+            report.add(str(err))
+            return handle_err(report.as_dict()), 400
+        return handle_err(err), 400
+    except RelationsError as err:
+        return handle_err(err), 400
+    else:
+        return handle_success(resp), 201
+    finally:
+        validation.observe()
+
+
+@endpoint.route('jobs/<int:job_id>', methods=['GET'])
+def job(job_id):
+    try:
+        resp = service.get_job(job_id)
+    except (SelectError, JobNotFound) as err:
+        return handle_err(err), 400
+    else:
+        return handle_success(resp), 200
+
+
 @endpoint.route('<int:import_id>/citizens', methods=['GET'])
-def citizen_collection(import_id):
+@_cached()
+def citizen_collection(import_id, import_info):
+    if import_info['citizen_count'] > settings.CITIZENS_STREAM_THRESHOLD:
+        citizens = service.iter_citizens(import_id, settings.CITIZENS_STREAM_ITERSIZE, import_info)
+        return handle_success_stream(citizens), 200
+
     try:
-        resp = service.get_citizens(import_id)
+        if settings.CITIZENS_JSON_MODE == 'postgres':
+            resp = handle_success_raw(service.get_citizens_json(import_id, import_info))
+        else:
+            resp = handle_success(service.get_citizens(import_id, import_info))
     except (SelectError, ImportIdNotFound) as err:
         return handle_err(err), 400
     else:
-        return handle_success(resp), 200
+        return resp, 200
 
 
 @endpoint.route('<int:import_id>/citizens/<int:citizen_id>', methods=['PATCH'])
 def citizen(import_id, citizen_id):
-    data, err = citizen_schema.load(request.json)
+    data, err = citizen_schema.load(_request_json())
     if err:
         return handle_err(err), 400
     try:
@@ -76,9 +254,10 @@ def citizen(import_id, citizen_id):
 
 
 @endpoint.route('<int:import_id>/citizens/birthdays', methods=['GET'])
-def birthdays(import_id):
+@_cached()
+def birthdays(import_id, import_info):
     try:
-        resp = service.get_birthdays(import_id)
+        resp = service.get_birthdays(import_id, import_info)
     except (SelectError, ImportIdNotFound) as err:
         return handle_err(err), 400
     else:
@@ -86,10 +265,13 @@ def birthdays(import_id):
 
 
 @endpoint.route('<int:import_id>/towns/stat/percentile/age', methods=['GET'])
-def age(import_id):
+@_cached(expiring=True)
+def age(import_id, import_info):
     try:
-        resp = service.get_age(import_id)
+        res, valid_until = service.get_age(import_id, import_info)
     except (SelectError, ImportIdNotFound) as err:
         return handle_err(err), 400
     else:
-        return handle_success(resp), 200
+        resp = handle_success(res)
+        resp.valid_until = valid_until
+        return resp, 200
@@ -2,6 +2,8 @@ from datetime import datetime
 
 from marshmallow import Schema, fields, validate, validates_schema, ValidationError, post_load, pre_load
 
+from .relations import DUPLICATED_CITIZEN
+
 GENDER = frozenset(['male', 'female'])
 
 
@@ -41,6 +43,14 @@ def _not_repeat(alist):
         raise ValidationError('Repeat relative')
 
 
+def _unique_citizen_ids(citizens):
+    citizen_ids = set()
+    for citizen_info in citizens:
+        if citizen_info['citizen_id'] in citizen_ids:
+            raise ValidationError(f'{DUPLICATED_CITIZEN}: citizen_id={citizen_info["citizen_id"]}')
+        citizen_ids.add(citizen_info['citizen_id'])
+
+
 class _UnknownRaiseMixin:
     @validates_schema(pass_original=True)
     def _check_unknown(self, data, origin_data):
@@ -110,4 +120,4 @@ class CitizenPost(CitizenBase):
 
 
 class Import(Schema, _UnknownRaiseMixin, _EmptyPayloadMixin):
-    citizens = fields.List(fields.Nested(CitizenPost), validate=_not_empty_list)
+    citizens = fields.List(fields.Nested(CitizenPost), validate=[_not_empty_list, _unique_citizen_ids])
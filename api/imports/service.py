@@ -1,7 +1,8 @@
-import pandas as pd
-from numpy import NaN
+from datetime import date
 
+from .age import town_percentiles, next_age_change
 from .dbm import DBManager
+from .relations import iter_relation_errors, RelationsChecker
 
 
 class RelationsError(Exception):
@@ -24,22 +25,31 @@ class SelectError(Exception):
     ...
 
 
+class JobNotFound(Exception):
+    ...
+
+
+class ImportValidationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
 class MockService:
     def put_citizens(self, data):
         ...
 
 
 class Service:
-    def __init__(self):
-        self._dbm = DBManager()
+    def __init__(self, cache=None, dbm=None):
+        self._dbm = dbm if dbm is not None else DBManager()
+        self._cache = cache
 
     def put_citizens(self, data):
         citizens = data['citizens']
 
         # relations check
-        check_df = self._check_relatives_data_prep(citizens)
-        self._check_relatives_present(check_df)
-        self._check_relatives_two_sided(check_df)
+        self._check_relatives(citizens)
 
         # good quality data insert
         try:
@@ -49,79 +59,133 @@ class Service:
 
         return import_id
 
-    def _check_relatives_data_prep(self, citizens):
-        check_data = {
-            'citizen': [],
-            'relative': []
-        }
-        for citizen_info in citizens:
-            citizen_id = citizen_info['citizen_id']
-            relatives = citizen_info['relatives']
-
-            if relatives:
-                check_data['citizen'] += [citizen_id] * len(relatives)
-                check_data['relative'] += relatives
-            else:
-                check_data['citizen'] += [citizen_id]
-                check_data['relative'] += [NaN]
-
-        check_df = pd.DataFrame(check_data)
-        # print('citizens data collected')
-        return check_df
-
-    def _check_relatives_present(self, check_df):
-        if set(check_df[check_df['relative'].notnull()]['relative']) - set(check_df['citizen']):
-            raise RelationsError('relative not found in citizen list')
-        # print('check1 passed')
-
-    def _check_relatives_two_sided(self, check_df):
-        check_df = pd.merge(
-            check_df,
-            check_df.rename(columns={'citizen': 'relative', 'relative': 'relatives_relative'}),
-            how='outer',
-            on=['relative']
-        )
-        check_df = check_df[check_df['relative'].notnull()]
-        check_df['found'] = check_df['citizen'] == check_df['relatives_relative']
-        check_df = check_df.groupby(['citizen', 'relative'])['found'].sum().reset_index()
-
-        if len(check_df) != sum(check_df['found']):
-            raise RelationsError('some relations are not two-sided')
+    def put_citizens_stream(self, citizens, load, batch_size=1000, report=None, progress=None):
+        """
+        Validate and insert citizens coming one by one from `citizens` iterable
+        in batches of `batch_size`. Everything inserted is rolled back on error.
+        `load` is schema load of one citizen returning (data, errors).
+        With `report` (ValidationReport) validation goes on after errors until
+        report is full and ImportValidationError carries the whole report.
+        `progress(validated, inserted)` is called every `batch_size` citizens.
+        """
+        checker = RelationsChecker()
+        import_id = None
+        citizen_count = 0
+        batch = []
 
-    def patch_citizen(self, import_id, citizen_id, citizen_upd):
-        citizen_ids = self._patch_citizen_check_data_prep(import_id)
-        self._patch_citizen_check_citizen_exists(citizen_id, citizen_ids)
-
-        relatives = self._patch_citizen_relatives_get(citizen_upd)
-        self._patch_citizen_check_relatives_exist(relatives, citizen_ids)
-
-        citizen_info = self._patch_citizen_get_citizen_info(import_id, citizen_id)
-        ex_relatives, new_relatives = self._patch_citizen_analyze_citizen_changes(citizen_info, relatives)
+        try:
+            for index, citizen_info in enumerate(citizens):
+                if progress is not None and index and index % batch_size == 0:
+                    progress(index, citizen_count)
+
+                citizen_info, err = load(citizen_info)
+                if report is not None:
+                    # report checks relations itself
+                    report.add_citizen(index, citizen_info, err)
+                    if report.truncated:
+                        break
+                    if report:
+                        # import is rejected anyway, only keep validating
+                        continue
+                else:
+                    if err:
+                        raise ImportValidationError({'citizens': {index: err}})
+                    error = checker.add(citizen_info['citizen_id'], citizen_info['relatives'])
+                    if error:
+                        raise self._relations_error(*error)
+
+                batch.append(citizen_info)
+                if len(batch) >= batch_size:
+                    import_id = self._put_citizens_batch(import_id, batch)
+                    citizen_count += len(batch)
+                    batch = []
+
+            if report is not None:
+                if not report.truncated:
+                    report.check_relations()
+                if not report and not batch and import_id is None:
+                    report.add('Field cannot be blank', field='citizens')
+                if report or report.truncated:
+                    raise ImportValidationError(report.as_dict())
+
+            if batch:
+                import_id = self._put_citizens_batch(import_id, batch)
+                citizen_count += len(batch)
+
+            if not citizen_count:
+                raise ImportValidationError({'citizens': ['Field cannot be blank']})
+
+            for error in checker.errors():
+                raise self._relations_error(*error)
+
+            self._dbm.complete_import(import_id, citizen_count)
+        except Exception:
+            self._dbm.rollback()
+            raise
+
+        return {'import_id': import_id}
+
+    def _put_citizens_batch(self, import_id, citizens):
+        try:
+            if import_id is None:
+                import_id = self._dbm.get_next_import_id()
+            self._dbm.insert_citizens_batch(import_id, citizens)
+        except Exception as err:  # TODO: Exception more detailed
+            raise InsertError(err)
+        return import_id
 
-        self._patch_citizen_update_citizen(import_id, citizen_info, citizen_upd)
+    def _check_relatives(self, citizens):
+        for error in iter_relation_errors(citizens):
+            raise self._relations_error(*error)
 
-        if ex_relatives:
-            for ex in ex_relatives:
-                self._patch_citizen_update_relation(import_id, citizen_id, ex, 'remove')
+    def _relations_error(self, reason, citizen_id, relative):
+        if relative is None:
+            return RelationsError(f'{reason}: citizen_id={citizen_id}')
+        return RelationsError(f'{reason}: citizen_id={citizen_id} relative={relative}')
 
-        if new_relatives:
-            for new in new_relatives:
-                self._patch_citizen_update_relation(import_id, citizen_id, new, 'add')
+    def patch_citizen(self, import_id, citizen_id, citizen_upd):
+        relatives = self._patch_citizen_relatives_get(citizen_upd)
 
-        citizen_info_updated = self._dbm.get_citizen(import_id, citizen_id)
-        return citizen_info_updated
+        # statements: import lock, state, citizen update (with age histogram, relations and birthdays)
+        try:
+            version = self._patch_citizen_lock_import(import_id)
+            state = self._patch_citizen_get_state(import_id, citizen_id, relatives)
+            citizen_ids = set(state['citizen_ids'])
+            self._patch_citizen_check_citizen_exists(citizen_id, citizen_ids)
+            self._patch_citizen_check_relatives_exist(relatives, citizen_ids)
+
+            ex_relatives, new_relatives = self._patch_citizen_analyze_citizen_changes(state, relatives)
+
+            citizen_info = self._patch_citizen_update_citizen(
+                import_id, citizen_id, citizen_upd, state, ex_relatives, new_relatives
+            )
+        except Exception:
+            # version is not bumped by rejected PATCH
+            self._dbm.rollback()
+            raise
+        citizen_info['relatives'] = list(relatives) if relatives is not None else state['relatives']
+
+        if self._cache:
+            self._cache.invalidate(import_id, version - 1)
+        return citizen_info
 
-    def _patch_citizen_check_data_prep(self, import_id):
+    def _patch_citizen_lock_import(self, import_id):
+        # concurrent PATCHes of the import wait here, so state is read after they are committed
         try:
-            citizen_ids = self._dbm.get_citizen_ids(import_id)
+            version = self._dbm.lock_import(import_id)
         except Exception as err:  # TODO: Exception more detailed
             raise SelectError(err)
 
-        if not citizen_ids['citizen_ids']:
+        if version is None:
             raise PatchCitizenError(f'No such import_id={import_id}')
+        return version
 
-        citizen_ids = set(citizen_ids['citizen_ids'])
-        return citizen_ids
+    def _patch_citizen_get_state(self, import_id, citizen_id, relatives):
+        try:
+            state = self._dbm.get_patch_state(import_id, citizen_id, {citizen_id, *(relatives or [])})
+        except Exception as err:  # TODO: Exception more detailed
+            raise SelectError(err)
+        return state
 
     def _patch_citizen_check_citizen_exists(self, citizen_id, citizen_ids):
         if citizen_id not in citizen_ids:
@@ -137,12 +201,8 @@ class Service:
         if relatives != None and set(relatives) - citizen_ids:
             raise PatchCitizenError('some relative not found')
 
-    def _patch_citizen_get_citizen_info(self, import_id, citizen_id):
-        citizen_info = self._dbm.get_citizen(import_id, citizen_id)
-        return citizen_info
-
     def _patch_citizen_analyze_citizen_changes(self, old_citizen_info, relatives):
-        ex_relatives, new_relatives = None, None
+        ex_relatives, new_relatives = set(), set()
         if relatives != None:
             old_relatives = old_citizen_info['relatives']
             ex_relatives = set(old_relatives) - set(relatives)
@@ -150,26 +210,48 @@ class Service:
 
         return ex_relatives, new_relatives
 
-    def _patch_citizen_update_citizen(self, import_id, citizen_info, citizen_upd):
-        citizen_info.update(citizen_upd)
-        citizen_info.update({'import_id': import_id})
-        self._dbm.update_citizen(citizen_info)
-
-    def _patch_citizen_update_relation(self, import_id, citizen_id, relative_id, mode='add'):
-        for left, right in zip([citizen_id, relative_id], [relative_id, citizen_id]):
-            relation = {
-                'import_id': import_id,
-                'citizen_id': left,
-                'relative': right,
-                'is_active': mode == 'add'
-            }
-            self._dbm.update_relation(relation)
+    def _patch_citizen_update_citizen(self, import_id, citizen_id, citizen_upd, state, ex_relatives, new_relatives):
+        # citizen buys presents in birthday months of relatives, relatives in birthday month of citizen
+        affected = set()
+        if 'birth_date' in citizen_upd:
+            affected.update(state['relatives'], new_relatives)
+        if ex_relatives or new_relatives:
+            affected.update({citizen_id, *ex_relatives, *new_relatives})
+
+        fields = {key: val for key, val in citizen_upd.items() if key != 'relatives'}
+        return self._dbm.update_citizen(
+            import_id, citizen_id, fields, state['town'], state['birth_date'],
+            new_relatives, ex_relatives, affected
+        )
 
-    # endpoint 3: get citizens
-    def get_citizens(self, import_id):
-        import_ids = self._dbm.get_import_ids()
-        if import_id not in import_ids:
+    def get_import(self, import_id):
+        try:
+            import_info = self._dbm.get_import(import_id)
+        except Exception as err:  # TODO: Exception more detailed
+            raise SelectError(err)
+
+        if not import_info:
             raise ImportIdNotFound(f'No such import_id={import_id}')
+        return import_info
+
+    def get_job(self, job_id):
+        try:
+            job = self._dbm.get_job(job_id)
+        except Exception as err:  # TODO: Exception more detailed
+            raise SelectError(err)
+
+        if not job:
+            raise JobNotFound(f'No such job_id={job_id}')
+        return job
+
+    def _check_import(self, import_id, import_info):
+        # import_info is row of get_import already read by caller, it saves a round trip
+        if import_info is None:
+            self.get_import(import_id)
+
+    # endpoint 3: get citizens
+    def get_citizens(self, import_id, import_info=None):
+        self._check_import(import_id, import_info)
         try:
             citizens = self._dbm.get_citizens(import_id)
         except Exception as err:  # TODO: Exception more detailed
@@ -177,11 +259,22 @@ class Service:
 
         return citizens
 
+    def get_citizens_json(self, import_id, import_info=None):
+        self._check_import(import_id, import_info)
+        try:
+            citizens = self._dbm.get_citizens_json(import_id)
+        except Exception as err:  # TODO: Exception more detailed
+            raise SelectError(err)
+
+        return citizens
+
+    def iter_citizens(self, import_id, itersize=2000, import_info=None):
+        self._check_import(import_id, import_info)
+        return self._dbm.iter_citizens(import_id, itersize)
+
     # endpoint 4: get birthdays
-    def get_birthdays(self, import_id):
-        import_ids = self._dbm.get_import_ids()
-        if import_id not in import_ids:
-            raise ImportIdNotFound(f'No such import_id={import_id}')
+    def get_birthdays(self, import_id, import_info=None):
+        self._check_import(import_id, import_info)
         try:
             birthdays = self._dbm.get_birthdays(import_id)
         except Exception as err:  # TODO: Exception more detailed
@@ -190,13 +283,16 @@ class Service:
         return birthdays
 
     # endpoint 5: get age
-    def get_age(self, import_id):
-        import_ids = self._dbm.get_import_ids()
-        if import_id not in import_ids:
-            raise ImportIdNotFound(f'No such import_id={import_id}')
+    def get_age(self, import_id, import_info=None):
+        """Age percentiles per town and the date they are valid until: next birthday in import."""
+        self._check_import(import_id, import_info)
         try:
-            age = self._dbm.get_age(import_id)
+            histogram = self._dbm.get_age_histogram(import_id)
         except Exception as err:  # TODO: Exception more detailed
             raise SelectError(err)
 
-        return age
+        today = date.today()
+        age = town_percentiles(histogram, today)
+        valid_until = next_age_change((birth_date for _, birth_date, _ in histogram), today)
+
+        return age, valid_until
@@ -0,0 +1,106 @@
+import codecs
+import json
+
+
+class PayloadError(Exception):
+    ...
+
+
+class CitizensStream:
+    """
+    Incremental parser of POST /imports body.
+
+    Iterating yields elements of top level `citizens` array one by one while
+    reading request stream by chunks, so only current citizen and one chunk
+    are kept in memory.
+    """
+    _whitespace = ' \t\n\r'
+
+    def __init__(self, stream, chunk_size=64 * 1024, max_item_size=1024 * 1024):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._max_item_size = max_item_size
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            raise PayloadError('Empty payload')
+
+        seen = False
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key != 'citizens' or seen:
+                raise PayloadError(f'Unknown field name {key}.')
+            seen = True
+            yield from self._citizens()
+
+            if self._peek() == '}':
+                break
+            self._expect(',')
+
+        self._expect('}')
+        if self._peek() is not None:
+            raise PayloadError('Extra data after payload')
+
+    def _citizens(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._expect(']')
+            return
+
+        while True:
+            yield self._value()
+            if self._peek() == ']':
+                self._expect(']')
+                return
+            self._expect(',')
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            self._buf += self._decoder.decode(b'', final=True)
+            return False
+
+        # drop consumed part of buffer
+        self._buf = self._buf[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self._whitespace:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise PayloadError(f'Bad JSON: expected {char!r} got {found!r} at {self._pos}')
+        self._pos += 1
+
+    def _value(self):
+        if self._peek() is None:
+            raise PayloadError('Bad JSON: unexpected end of payload')
+
+        while True:
+            try:
+                value, self._pos = self._json.raw_decode(self._buf, self._pos)
+                return value
+            except json.JSONDecodeError as err:
+                if len(self._buf) - self._pos > self._max_item_size:
+                    raise PayloadError(f'Bad JSON: item is larger than {self._max_item_size} bytes')
+                if not self._fill():
+                    raise PayloadError(f'Bad JSON: {err}')
@@ -0,0 +1,330 @@
+"""
+Validation of POST /imports payload without marshmallow.
+
+`Import` and `CitizenPost` are drop-in replacements of the schemas with the
+same name: `load` returns (data, errors) with the same data and error
+messages, but field metadata is resolved once and citizens are checked
+in a plain loop.
+"""
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import repeat
+
+from .relations import DUPLICATED_CITIZEN
+from .schema import GENDER
+
+
+MISSING = 'Missing data for required field.'
+NULL = 'Field may not be null.'
+BLANK = 'Field cannot be blank'
+EMPTY_PAYLOAD = 'Empty payload'
+INVALID_INPUT = 'Invalid input type.'
+INVALID_STRING = 'Not a valid string.'
+INVALID_INTEGER = 'Not a valid integer.'
+INVALID_LIST = 'Not a valid list.'
+
+_missing = object()
+_date = re.compile(r'(\d\d)\.(\d\d)\.(\d{4})', re.ASCII)
+
+
+class FieldError(Exception):
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.messages = messages
+
+
+def _integer(value):
+    if value.__class__ is int:
+        return value
+    # like marshmallow Integer: floats are truncated, numeric strings accepted
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise FieldError([INVALID_INTEGER])
+
+
+def _string(value):
+    if not isinstance(value, str):
+        raise FieldError([INVALID_STRING])
+    return value
+
+
+def _parse_date(value):
+    match = _date.fullmatch(value)
+    try:
+        if match:
+            return date(int(match[3]), int(match[2]), int(match[1]))
+        # rare formats accepted by strptime, e.g. '1.2.1986'
+        return datetime.strptime(value, '%d.%m.%Y').date()
+    except ValueError:
+        return None
+
+
+def _load_citizen_id(value, today):
+    value = _integer(value)
+    if value < 0:
+        raise FieldError(['citizen_id must be greater than 0.'])
+    return value
+
+
+def _load_apartment(value, today):
+    value = _integer(value)
+    if value < 0:
+        raise FieldError(['apartment must be greater than 1.'])
+    return value
+
+
+def _load_not_blank(value, today):
+    if not _string(value):
+        raise FieldError([BLANK])
+    return value
+
+
+def _load_gender(value, today):
+    if _string(value) not in GENDER:
+        raise FieldError([f'Unexpected gender {value}'])
+    return value
+
+
+def _load_birth_date(value, today):
+    birth_date = _parse_date(_string(value))
+    if birth_date is None:
+        raise FieldError([f'Bad date format {value}'])
+    if birth_date > today:
+        raise FieldError(['Future date'])
+    return value
+
+
+def _load_relatives(value, today):
+    if value.__class__ is not list:
+        raise FieldError([INVALID_LIST])
+
+    relatives, errors = [], {}
+    for index, relative in enumerate(value):
+        if relative.__class__ is not int:
+            # schema stringifies relatives before loading, so only ints and numeric strings pass
+            try:
+                relative = int(str(relative))
+            except ValueError:
+                errors[index] = [INVALID_INTEGER]
+                continue
+        if relative < 0:
+            errors[index] = ['citizen_id must be greater than 0.']
+            continue
+        relatives.append(relative)
+
+    if errors:
+        raise FieldError(errors)
+    if len(set(relatives)) < len(relatives):
+        raise FieldError(['Repeat relative'])
+    return relatives
+
+
+_citizen_fields = {
+    'citizen_id': _load_citizen_id,
+    'town': _load_not_blank,
+    'street': _load_not_blank,
+    'building': _load_not_blank,
+    'apartment': _load_apartment,
+    'name': _load_not_blank,
+    'birth_date': _load_birth_date,
+    'gender': _load_gender,
+    'relatives': _load_relatives
+}
+
+
+def _load_valid_citizen(citizen, today):
+    """Fast path for a valid citizen of plain JSON types: loaded citizen or None to check it field by field."""
+    if len(citizen) != len(_citizen_fields):
+        return None
+
+    get = citizen.get
+    citizen_id, apartment, relatives = get('citizen_id'), get('apartment'), get('relatives')
+    town, street, building, name = get('town'), get('street'), get('building'), get('name')
+    gender, birth_date = get('gender'), get('birth_date')
+    if not (
+        citizen_id.__class__ is int and citizen_id >= 0 and apartment.__class__ is int and apartment >= 0
+        and town.__class__ is str and town and street.__class__ is str and street
+        and building.__class__ is str and building and name.__class__ is str and name
+        and gender.__class__ is str and gender in GENDER
+        and birth_date.__class__ is str and relatives.__class__ is list
+    ):
+        return None
+
+    match = _date.fullmatch(birth_date)
+    if not match:
+        return None
+    try:
+        if date(int(match[3]), int(match[2]), int(match[1])) > today:
+            return None
+    except ValueError:
+        return None
+
+    for relative in relatives:
+        if relative.__class__ is not int or relative < 0:
+            return None
+    if len(set(relatives)) < len(relatives):
+        return None
+
+    return {
+        'citizen_id': citizen_id, 'town': town, 'street': street, 'building': building, 'apartment': apartment,
+        'name': name, 'birth_date': birth_date, 'gender': gender, 'relatives': relatives
+    }
+
+
+def _unknown(payload, fields):
+    return [f'Unknown field name {key}.' for key in payload if key not in fields]
+
+
+def _load_citizen(citizen, today):
+    if not isinstance(citizen, dict):
+        return None, {'_schema': [INVALID_INPUT]}
+
+    data = _load_valid_citizen(citizen, today)
+    if data is not None:
+        return data, {}
+
+    data, errors = {}, {}
+    for name, load in _citizen_fields.items():
+        value = citizen.get(name, _missing)
+        if value is _missing:
+            errors[name] = [MISSING]
+        elif value is None:
+            errors[name] = [NULL]
+        else:
+            try:
+                data[name] = load(value, today)
+            except FieldError as err:
+                errors[name] = err.messages
+
+    if not citizen.keys() <= _citizen_fields.keys():
+        errors['_schema'] = _unknown(citizen, _citizen_fields)
+    return data, errors
+
+
+class CitizenPost:
+    def load(self, citizen):
+        return _load_citizen(citizen, date.today())
+
+
+def _load_citizens(citizens, today):
+    """Loaded citizens, their errors and first duplicated citizen_id."""
+    loaded, errors = [], {}
+    citizen_ids, duplicated = set(), None
+    for index, citizen in enumerate(citizens):
+        if citizen is None:
+            errors[index] = [NULL]
+            loaded.append(None)
+            continue
+
+        citizen, err = _load_citizen(citizen, today)
+        if err:
+            errors[index] = err
+        elif duplicated is None:
+            if citizen['citizen_id'] in citizen_ids:
+                duplicated = citizen['citizen_id']
+            citizen_ids.add(citizen['citizen_id'])
+        loaded.append(citizen)
+
+    return loaded, errors, duplicated
+
+
+def _first_duplicated(citizens):
+    citizen_ids = set()
+    for citizen in citizens:
+        if citizen['citizen_id'] in citizen_ids:
+            return citizen['citizen_id']
+        citizen_ids.add(citizen['citizen_id'])
+    return None
+
+
+def spawn_executable(executable=None):
+    """
+    Python interpreter for spawned processes: `executable` if given, else
+    sys.executable, which is uWSGI binary in uWSGI workers, so python3 of
+    sys.exec_prefix (virtualenv set by `home` of app.ini) is used there.
+    """
+    if executable:
+        return executable
+    if os.path.basename(sys.executable).startswith('uwsgi'):
+        return os.path.join(sys.exec_prefix, 'bin', 'python3')
+    return sys.executable
+
+
+class Import:
+    """
+    Citizens lists of at least `parallel_threshold` citizens are split into
+    chunks loaded by a pool of `workers` processes, duplicates are searched
+    after chunks are merged. Processes are spawned with `executable`, see
+    `spawn_executable`.
+    """
+    _chunks_per_worker = 4
+
+    def __init__(self, workers=1, parallel_threshold=50000, executable=None):
+        self._workers = workers
+        self._parallel_threshold = parallel_threshold
+        self._executable = executable
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def load(self, payload):
+        if not payload:
+            return None, {'_schema': [EMPTY_PAYLOAD]}
+        if not isinstance(payload, dict):
+            return None, {'_schema': [INVALID_INPUT]}
+
+        data, errors = {}, {}
+        citizens = payload.get('citizens', _missing)
+        if citizens is None:
+            errors['citizens'] = [NULL]
+        elif citizens is _missing:
+            pass
+        elif citizens.__class__ is not list:
+            errors['citizens'] = [INVALID_LIST]
+        elif not citizens:
+            errors['citizens'] = [BLANK]
+        else:
+            if self._workers > 1 and len(citizens) >= self._parallel_threshold:
+                data['citizens'], citizens_errors, duplicated = self._load_citizens_parallel(citizens)
+            else:
+                data['citizens'], citizens_errors, duplicated = _load_citizens(citizens, date.today())
+            if citizens_errors:
+                errors['citizens'] = citizens_errors
+            elif duplicated is not None:
+                errors['citizens'] = [f'{DUPLICATED_CITIZEN}: citizen_id={duplicated}']
+
+        if len(payload) > ('citizens' in payload):
+            errors['_schema'] = _unknown(payload, ('citizens',))
+        return data, errors
+
+    def _load_citizens_parallel(self, citizens):
+        today = date.today()
+        size = -(-len(citizens) // (self._workers * self._chunks_per_worker))
+        offsets = range(0, len(citizens), size)
+        chunks = (citizens[offset:offset + size] for offset in offsets)
+
+        loaded, errors = [], {}
+        results = self._get_executor().map(_load_citizens, chunks, repeat(today))
+        for offset, (chunk_loaded, chunk_errors, _) in zip(offsets, results):
+            loaded.extend(chunk_loaded)
+            for index, err in chunk_errors.items():
+                errors[offset + index] = err
+
+        duplicated = None if errors else _first_duplicated(loaded)
+        return loaded, errors, duplicated
+
+    def _get_executor(self):
+        with self._lock:
+            # processes of the pool belong to the worker which started them
+            if self._executor is None or self._pid != os.getpid():
+                context = multiprocessing.get_context('spawn')
+                context.set_executable(spawn_executable(self._executable))
+                self._executor = ProcessPoolExecutor(self._workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
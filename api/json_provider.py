@@ -0,0 +1,82 @@
+"""
+JSON encoding and decoding of API bodies with the fastest available library:
+orjson, then ujson, then stdlib json.
+
+All backends produce the same documents: UTF-8 without ASCII escaping, keys
+in insertion order, dates and datetimes as HTTP dates (like Flask encoder),
+Decimals as numbers and UUIDs as strings.
+"""
+import json
+import logging
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from werkzeug.http import http_date
+
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    if isinstance(obj, date):
+        return http_date(obj.timetuple())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _orjson():
+    import orjson
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=_default, option=options)
+
+    return dumps, orjson.loads
+
+
+def _ujson():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(
+            obj, default=_default, ensure_ascii=False, escape_forward_slashes=False, reject_bytes=True
+        ).encode()
+
+    return dumps, ujson.loads
+
+
+def _stdlib():
+    encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        return encoder.encode(obj).encode()
+
+    return dumps, json.loads
+
+
+_backends = {
+    'orjson': _orjson,
+    'ujson': _ujson,
+    'json': _stdlib
+}
+
+
+def load_backend(name='auto'):
+    """Return (name, dumps, loads), `dumps` returns bytes. Name is 'auto' or one of backends."""
+    if name != 'auto' and name not in _backends:
+        raise ValueError(f'Unknown JSON backend {name}')
+
+    names = list(_backends) if name == 'auto' else [name]
+    for backend in names:
+        try:
+            dumps, loads = _backends[backend]()
+        except ImportError:
+            continue
+        logger.info('JSON backend=%s', backend)
+        return backend, dumps, loads
+    raise ImportError(f'JSON backend {name} is not available')
@@ -0,0 +1,86 @@
+import atexit
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+
+class InfoSamplingFilter(logging.Filter):
+    """Passes `rate` share of records up to INFO level and every record above it."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self._rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.INFO or self._rate >= 1 or random.random() < self._rate
+
+
+class WorkerQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records to a queue emptied to `handlers` by a listener thread, so
+    logging call never waits for stream. Threads do not survive fork of uWSGI
+    workers, listener is started by the first record logged in a process.
+    """
+
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        self._handlers = handlers
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().enqueue(record)
+
+    def prepare(self, record):
+        # message is formatted by handlers in listener thread
+        return record
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, *self._handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            # flush records left in queue on exit
+            atexit.register(self._listener.stop)
+
+
+def setup_logging(config, use_queue=True, info_sample_rate=1.0):
+    """
+    Configure logging from `config` file, then handlers of every configured
+    logger are moved behind WorkerQueueHandler (one per distinct handler set)
+    and INFO records are sampled.
+    """
+    logging.config.fileConfig(config)
+    sampling = InfoSamplingFilter(info_sample_rate)
+
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    queue_handlers = {}
+    for logger in loggers:
+        handlers = tuple(logger.handlers)
+        if not handlers:
+            continue
+        if not use_queue:
+            for handler in handlers:
+                if sampling not in handler.filters:
+                    handler.addFilter(sampling)
+            continue
+
+        if handlers not in queue_handlers:
+            queue_handlers[handlers] = WorkerQueueHandler(handlers)
+            queue_handlers[handlers].addFilter(sampling)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handlers[handlers])
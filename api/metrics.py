@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# uWSGI workers write samples to files in that directory, /metrics sums them up
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv('prometheus_multiproc_dir')
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests', ['route', 'method', 'status'])
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency', ['route', 'method'])
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time of HTTP request spent in DBManager queries', ['route', 'method']
+)
+REQUEST_PYTHON_SECONDS = Histogram(
+    'http_request_python_seconds', 'Time of HTTP request spent outside of queries and connection pool',
+    ['route', 'method']
+)
+REQUEST_BYTES = Histogram('http_request_size_bytes', 'HTTP request body size', ['route', 'method'], buckets=SIZE_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    'http_response_size_bytes', 'HTTP response body size, streamed responses are not counted', ['route', 'method'],
+    buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled', multiprocess_mode='livesum')
+CONNECTION_ACQUIRE_SECONDS = Histogram('db_connection_acquire_seconds', 'Time of taking connection from pool')
+VALIDATION_SECONDS = Histogram(
+    'import_validation_seconds', 'Time of POST /imports payload validation', ['mode']
+)
+
+_local = threading.local()
+_collectors = []
+
+
+class CacheCollector:
+    """
+    Response cache counters read from `cache.stats()` on scrape: shared by
+    workers for uWSGI cache, of the scraped worker for local one.
+    """
+    _counters = ('hits', 'misses', 'evictions')
+    _gauges = ('items', 'bytes')
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def collect(self):
+        stats = self._cache.stats()
+        for name in self._counters:
+            if name in stats:
+                yield CounterMetricFamily(f'response_cache_{name}', f'Response cache {name}', value=stats[name])
+        for name in self._gauges:
+            if name in stats:
+                yield GaugeMetricFamily(f'response_cache_{name}', f'Response cache {name}', value=stats[name])
+
+
+def register_collector(collector):
+    """Add collector of values kept outside of prometheus_client to /metrics."""
+    _collectors.append(collector)
+    if not MULTIPROC_DIR:
+        REGISTRY.register(collector)
+
+
+def start_request():
+    IN_FLIGHT.inc()
+    _local.start = time.perf_counter()
+    _local.db_seconds = 0.0
+    _local.acquire_seconds = 0.0
+
+
+def finish_request(route, method, status, request_size=None, response_size=None):
+    start = getattr(_local, 'start', None)
+    if start is None:
+        return
+    _local.start = None
+    IN_FLIGHT.dec()
+
+    seconds = time.perf_counter() - start
+    REQUESTS.labels(route, method, status).inc()
+    REQUEST_SECONDS.labels(route, method).observe(seconds)
+    REQUEST_DB_SECONDS.labels(route, method).observe(_local.db_seconds)
+    REQUEST_PYTHON_SECONDS.labels(route, method).observe(
+        max(seconds - _local.db_seconds - _local.acquire_seconds, 0)
+    )
+    if request_size is not None:
+        REQUEST_BYTES.labels(route, method).observe(request_size)
+    if response_size is not None:
+        RESPONSE_BYTES.labels(route, method).observe(response_size)
+
+
+def observe_query(seconds):
+    """Adds query time to the request handled by this thread, if any."""
+    if getattr(_local, 'start', None) is not None:
+        _local.db_seconds += seconds
+
+
+def observe_acquire(seconds):
+    CONNECTION_ACQUIRE_SECONDS.observe(seconds)
+    if getattr(_local, 'start', None) is not None:
+        _local.acquire_seconds += seconds
+
+
+class ValidationTimer:
+    """
+    `load` summing up time of its calls, observed once per payload by `observe`:
+    streamed payloads are loaded citizen by citizen.
+    """
+
+    def __init__(self, load, mode):
+        self._load = load
+        self._mode = mode
+        self.seconds = 0.0
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._load(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def observe(self):
+        VALIDATION_SECONDS.labels(self._mode).observe(self.seconds)
+
+
+def exposition():
+    """(body, content type) of metrics of all workers."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drops in-flight gauge of exited worker."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(Exception):
+    ...
+
+
+class PoolTimeout(PoolError):
+    ...
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of PostgreSQL connections owned by one worker process.
+
+    Connections are opened lazily up to `max_size`, `min_size` of them are kept
+    open between requests. Borrowed connection idle longer than `check_idle` seconds
+    is checked with a ping before it is handed out, connections older than
+    `max_lifetime` seconds are reopened.
+    When pool is exhausted `getconn` waits `timeout` seconds and raises PoolTimeout.
+    """
+
+    def __init__(self, uri, min_size=1, max_size=10, max_lifetime=3600, timeout=30, check=True, check_idle=0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise PoolError(f'Bad pool size min_size={min_size} max_size={max_size}')
+
+        self._uri = uri
+        self._min_size = min_size
+        self._max_size = max_size
+        self._max_lifetime = max_lifetime
+        self._timeout = timeout
+        self._check = check
+        self._check_idle = check_idle
+
+        self._pid = os.getpid()
+        self._idle = []
+        self._created = {}
+        self._released = {}
+        self._size = 0
+        self._cond = threading.Condition()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def getconn(self):
+        self._check_fork()
+        deadline = time.monotonic() + self._timeout
+
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._usable(conn):
+                        return conn
+                    self._discard(conn)
+
+                if self._size < self._max_size:
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f'No free connection in {self._timeout}s, pool size={self._max_size}')
+                self._cond.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, close=False):
+        if os.getpid() != self._pid:
+            return
+
+        with self._cond:
+            if close or conn.closed or self._expired(conn) or not self._reset(conn):
+                self._discard(conn)
+            elif len(self._idle) >= self._min_size and self._size > self._min_size:
+                self._discard(conn)
+            else:
+                self._released[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def _connect(self):
+        logger.info('Opening pool connection')
+        conn = psycopg2.connect(self._uri)
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        self._released.pop(id(conn), None)
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _expired(self, conn):
+        created = self._created.get(id(conn), 0)
+        return time.monotonic() - created > self._max_lifetime
+
+    def _usable(self, conn):
+        if conn.closed or self._expired(conn):
+            return False
+        if not self._check or time.monotonic() - self._released.get(id(conn), 0) <= self._check_idle:
+            return True
+        # transaction opened by ping is the one of the borrower, it is not rolled back
+        try:
+            with conn.cursor() as cur:
+                cur.execute('select 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _reset(self, conn):
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _check_fork(self):
+        # connections inherited from the parent process must not be reused by the child
+        if os.getpid() == self._pid:
+            return
+        with self._cond:
+            self._pid = os.getpid()
+            self._idle = []
+            self._created = {}
+            self._released = {}
+            self._size = 0
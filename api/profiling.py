@@ -0,0 +1,134 @@
+import bisect
+import logging
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import cursor as PlainCursor
+from psycopg2.extras import RealDictCursor
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of query time histogram buckets, seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class QueryStats:
+    """Count, time, rows, bytes sent and time histogram per query name in this process."""
+
+    def __init__(self, buckets=BUCKETS):
+        self._buckets = buckets
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, rows, size):
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = {
+                    'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'buckets': [0] * (len(self._buckets) + 1)
+                }
+            stat['count'] += 1
+            stat['seconds'] += seconds
+            stat['rows'] += rows
+            stat['bytes'] += size
+            stat['buckets'][bisect.bisect_left(self._buckets, seconds)] += 1
+
+    def snapshot(self):
+        """Stats by query name, buckets are cumulative counts by upper bound like Prometheus `le`."""
+        bounds = [str(bound) for bound in self._buckets] + ['+Inf']
+        res = {}
+        with self._lock:
+            for name, stat in self._stats.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(bounds, stat['buckets']):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                res[name] = dict(stat, buckets=buckets)
+        return res
+
+
+class QueryProfiler:
+    """
+    Records every query of profiling cursors to `stats` and logs queries
+    slower than `slow_seconds` (None disables), with EXPLAIN (ANALYZE, BUFFERS)
+    of them if `explain` is set. `on_query` is called with time of every query.
+    """
+
+    def __init__(self, stats=None, slow_seconds=None, explain=False, on_query=None):
+        self.stats = stats if stats is not None else QueryStats()
+        self._slow_seconds = slow_seconds
+        self._explain = explain
+        self._on_query = on_query
+
+    def cursor(self, connection, query_name, cursor_factory=None, **kwargs):
+        """Cursor of `connection` recording its queries as `query_name`, `kwargs` go to `connection.cursor`."""
+        cur = connection.cursor(cursor_factory=_profiling_factories[cursor_factory or PlainCursor], **kwargs)
+        cur.profiler = self
+        cur.query_name = query_name
+        return cur
+
+    def record(self, cur, seconds, size=None):
+        rows = max(cur.rowcount, 0)
+        if size is None:
+            size = len(cur.query or b'')
+        self.stats.add(cur.query_name, seconds, rows, size)
+        if self._on_query is not None:
+            self._on_query(seconds)
+
+        if self._slow_seconds is not None and seconds >= self._slow_seconds:
+            logger.warning(
+                'slow query name=%s seconds=%.3f rows=%d query=%.1000s',
+                cur.query_name, seconds, rows, (cur.query or b'').decode(errors='replace')
+            )
+            if self._explain and cur.name is None:
+                self._log_plan(cur)
+
+    def _log_plan(self, cur):
+        query = cur.query.lstrip()
+        if not query[:6].lower().startswith((b'select', b'with')):
+            return
+
+        # ANALYZE executes the statement again, its changes are rolled back to savepoint
+        with cur.connection.cursor() as explain_cur:
+            explain_cur.execute('savepoint explain_slow_query')
+            try:
+                explain_cur.execute(b'explain (analyze, buffers) ' + query)
+                plan = '\n'.join(row[0] for row in explain_cur.fetchall())
+            except psycopg2.Error as err:
+                plan = f'not available: {err}'
+            finally:
+                explain_cur.execute('rollback to savepoint explain_slow_query')
+        logger.warning('slow query plan name=%s\n%s', cur.query_name, plan)
+
+
+class _ProfilingMixin:
+    profiler = None
+    query_name = None
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        res = super().execute(query, vars)
+        self.profiler.record(self, time.perf_counter() - start)
+        return res
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        res = super().copy_expert(sql, file, size)
+        self.profiler.record(self, time.perf_counter() - start, size=file.tell())
+        return res
+
+
+class ProfilingCursor(_ProfilingMixin, PlainCursor):
+    ...
+
+
+class ProfilingRealDictCursor(_ProfilingMixin, RealDictCursor):
+    ...
+
+
+_profiling_factories = {
+    PlainCursor: ProfilingCursor,
+    RealDictCursor: ProfilingRealDictCursor
+}
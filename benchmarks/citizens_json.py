@@ -0,0 +1,49 @@
+"""
+GET /imports/<id>/citizens: Flask encoding of rows vs document built by PostgreSQL.
+Reports wall latency and CPU time spent in the worker process per request.
+
+Usage (database from DB_URI must be available):
+    python -m benchmarks.citizens_json --citizens 10000 --repeat 10
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+from api.app import app  # noqa: E402
+from benchmarks.insert import generate  # noqa: E402
+import settings  # noqa: E402
+
+
+def run(client, import_id, mode, repeat):
+    settings.CITIZENS_JSON_MODE = mode
+    wall, cpu = [], []
+    for _ in range(repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        rv = client.get(f'/imports/{import_id}/citizens')
+        rv.get_data()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+        assert rv.status_code == 200
+    return statistics.median(wall), statistics.median(cpu)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    settings.CITIZENS_STREAM_THRESHOLD = float('inf')
+    client = app.test_client()
+
+    print(f'{"citizens":>10} {"mode":>9} {"wall ms":>9} {"cpu ms":>9}')
+    for citizens_cnt in args.citizens:
+        citizens = generate(citizens_cnt, 0)
+        rv = client.post('/imports', json={'citizens': citizens})
+        import_id = rv.json['data']['import_id']
+        for mode in ('python', 'postgres'):
+            wall, cpu = run(client, import_id, mode, args.repeat)
+            print(f'{citizens_cnt:>10} {mode:>9} {wall * 1000:>9.1f} {cpu * 1000:>9.1f}')
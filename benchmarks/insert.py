@@ -0,0 +1,62 @@
+"""
+Rows/sec of DBManager.insert_citizens_batch: INSERT ... VALUES vs COPY.
+
+Usage (database from DB_URI must be available, nothing is committed):
+    python -m benchmarks.insert --citizens 10000 100000 --relatives 10
+"""
+import argparse
+import random
+import time
+
+import psycopg2
+
+from api.imports.dbm import DBManager
+import settings
+
+
+def generate(citizens_cnt, relatives_cnt, seed=13):
+    random.seed(seed)
+    return [
+        {
+            'citizen_id': citizen_id,
+            'town': 'Москва',
+            'street': 'Льва Толстого',
+            'building': '16к7стр5',
+            'apartment': random.randrange(1000),
+            'name': 'Иванов Иван Иванович',
+            'birth_date': f'{random.randint(1, 28):02}.{random.randint(1, 12):02}.{random.randint(1940, 2010)}',
+            'gender': random.choice(['male', 'female']),
+            'relatives': random.sample(range(citizens_cnt), relatives_cnt)
+        }
+        for citizen_id in range(citizens_cnt)
+    ]
+
+
+def timeit(conn, copy_threshold, citizens):
+    dbm = DBManager(conn, copy_threshold=copy_threshold)
+    start = time.perf_counter()
+    dbm.insert_citizens_batch(dbm.get_next_import_id(), citizens)
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--relatives', type=int, default=10)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(settings.DB_URI)
+    DBManager(conn).init_database()
+    conn.commit()
+
+    print(f'{"citizens":>10} {"rows":>10} {"values rows/s":>14} {"copy rows/s":>12}')
+    for citizens_cnt in args.citizens:
+        citizens = generate(citizens_cnt, args.relatives)
+        rows = citizens_cnt * (1 + args.relatives)
+        values = timeit(conn, float('inf'), citizens)
+        copy = timeit(conn, 0, citizens)
+        print(f'{citizens_cnt:>10} {rows:>10} {rows / values:>14.0f} {rows / copy:>12.0f}')
+
+    conn.close()
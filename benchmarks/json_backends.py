@@ -0,0 +1,47 @@
+"""
+Encoding of GET /imports/<id>/citizens document: Flask `jsonify` vs JSON backends.
+
+Usage:
+    python -m benchmarks.json_backends --citizens 10000 --repeat 10
+"""
+import argparse
+import time
+
+from flask import Flask, jsonify
+
+from api.json_provider import load_backend
+from benchmarks.insert import generate
+
+
+def timeit(func, document, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(document)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def available():
+    for name in ('orjson', 'ujson', 'json'):
+        try:
+            yield load_backend(name)[:2]
+        except ImportError:
+            continue
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f'{"citizens":>10} {"backend":>8} {"ms":>9}')
+    with app.app_context():
+        for citizens_cnt in args.citizens:
+            document = {'data': generate(citizens_cnt, 2)}
+            flask_time = timeit(lambda doc: jsonify(doc).get_data(), document, args.repeat)
+            print(f'{citizens_cnt:>10} {"flask":>8} {flask_time * 1000:>9.1f}')
+            for name, dumps in available():
+                print(f'{citizens_cnt:>10} {name:>8} {timeit(dumps, document, args.repeat) * 1000:>9.1f}')
@@ -0,0 +1,34 @@
+"""
+Scaling of POST /imports payload validation with VALIDATION_WORKERS processes.
+
+Usage:
+    python -m benchmarks.parallel_validation --citizens 200000 --workers 1 2 4 8
+"""
+import argparse
+import os
+
+from api.imports import validator
+from benchmarks.insert import generate
+from benchmarks.validation import timeit
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, default=200_000)
+    parser.add_argument('--relatives', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = {'citizens': generate(args.citizens, args.relatives)}
+    print(f'cpus={os.cpu_count()} citizens={args.citizens}')
+    print(f'{"workers":>8} {"s":>8} {"speedup":>8}')
+    serial = None
+    for workers in args.workers:
+        import_schema = validator.Import(workers=workers, parallel_threshold=1)
+        if workers > 1:
+            # start pool processes before timing
+            import_schema.load({'citizens': payload['citizens'][:workers]})
+        seconds = timeit(import_schema, payload, args.repeat)
+        serial = serial or seconds
+        print(f'{workers:>8} {seconds:>8.3f} {serial / seconds:>8.2f}')
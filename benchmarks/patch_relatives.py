@@ -0,0 +1,42 @@
+"""
+PATCH /imports/<id>/citizens/<cid> latency vs number of relatives replaced.
+
+Usage (database from DB_URI must be available):
+    python -m benchmarks.patch_relatives --citizens 1000 --repeat 20
+"""
+import argparse
+import statistics
+import time
+
+from api.app import app
+from benchmarks.insert import generate
+
+
+def run(citizens, counts, repeat):
+    client = app.test_client()
+    rv = client.post('/imports', json={'citizens': generate(citizens, 0)})
+    import_id = rv.json['data']['import_id']
+
+    print(f'{"relatives":>10} {"median ms":>10} {"p95 ms":>10}')
+    for count in counts:
+        relatives = list(range(2, count + 2))
+        timings = []
+        for _ in range(repeat):
+            for payload in (relatives, []):
+                start = time.perf_counter()
+                rv = client.patch(f'/imports/{import_id}/citizens/1', json={'relatives': payload})
+                timings.append(time.perf_counter() - start)
+                assert rv.status_code == 200, rv.json
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f'{count:>10} {statistics.median(timings) * 1000:>10.2f} {p95 * 1000:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, default=1000)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 10, 50, 100, 500])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    run(args.citizens, args.counts, args.repeat)
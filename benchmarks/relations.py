@@ -0,0 +1,87 @@
+"""
+Relations validation of POST /imports on dense relation graphs.
+
+Usage:
+    python -m benchmarks.relations
+    python -m benchmarks.relations --legacy   # also time previous pandas validator
+"""
+import argparse
+import random
+import time
+
+from api.imports.relations import iter_relation_errors
+
+
+def generate(citizens_cnt, relations_cnt, seed=13):
+    random.seed(seed)
+    relatives = {citizen_id: set() for citizen_id in range(citizens_cnt)}
+    pairs = 0
+    while pairs * 2 < relations_cnt:
+        left, right = random.randrange(citizens_cnt), random.randrange(citizens_cnt)
+        if left == right or right in relatives[left]:
+            continue
+        relatives[left].add(right)
+        relatives[right].add(left)
+        pairs += 1
+
+    return [
+        {'citizen_id': citizen_id, 'relatives': list(rels)}
+        for citizen_id, rels in relatives.items()
+    ]
+
+
+def check(citizens):
+    return next(iter_relation_errors(citizens), None)
+
+
+def check_legacy(citizens):
+    import pandas as pd
+
+    check_data = {'citizen': [], 'relative': []}
+    for citizen_info in citizens:
+        relatives = citizen_info['relatives'] or [None]
+        check_data['citizen'] += [citizen_info['citizen_id']] * len(relatives)
+        check_data['relative'] += relatives
+
+    check_df = pd.DataFrame(check_data)
+    if set(check_df[check_df['relative'].notnull()]['relative']) - set(check_df['citizen']):
+        return 'relative not found'
+
+    check_df = pd.merge(
+        check_df,
+        check_df.rename(columns={'citizen': 'relative', 'relative': 'relatives_relative'}),
+        how='outer',
+        on=['relative']
+    )
+    check_df = check_df[check_df['relative'].notnull()]
+    check_df['found'] = check_df['citizen'] == check_df['relatives_relative']
+    check_df = check_df.groupby(['citizen', 'relative'])['found'].sum().reset_index()
+    if len(check_df) != sum(check_df['found']):
+        return 'not two-sided'
+
+
+def timeit(func, citizens, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func(citizens)
+        timings.append(time.perf_counter() - start)
+    assert res is None, res
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--relations', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    print(f'{"citizens":>10} {"relations":>10} {"set s":>8}' + (f' {"pandas s":>9}' if args.legacy else ''))
+    for citizens_cnt in args.citizens:
+        citizens = generate(citizens_cnt, args.relations)
+        line = f'{citizens_cnt:>10} {args.relations:>10} {timeit(check, citizens, args.repeat):>8.3f}'
+        if args.legacy:
+            line += f' {timeit(check_legacy, citizens, 1):>9.3f}'
+        print(line)
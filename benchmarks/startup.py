@@ -0,0 +1,58 @@
+"""
+Worker startup cost: `python -X importtime` total and peak RSS after import.
+
+Usage:
+    python -m benchmarks.startup                  # api.app, with and without pandas
+    python -m benchmarks.startup --module api.imports.resource --extra pandas numpy
+
+Importing api.app connects to database from DB_URI (tables initialization).
+"""
+import argparse
+import subprocess
+import sys
+
+
+_SCRIPT = """
+import resource
+{imports}
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def measure(modules):
+    script = _SCRIPT.format(imports='\n'.join(f'import {module}' for module in modules))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True
+    )
+
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us = line.split(':', 1)[1].split('|')[0]
+        total_us += int(self_us)
+
+    rss_kb = int(proc.stdout.strip().splitlines()[-1])
+    return total_us / 1000, rss_kb / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='api.app')
+    parser.add_argument('--extra', nargs='*', default=['pandas', 'numpy'],
+                        help='modules imported before the change, measured as "before"')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    cases = [('after', [args.module])]
+    if args.extra:
+        cases.insert(0, ('before', [*args.extra, args.module]))
+
+    print(f'{"case":>8} {"import ms":>10} {"max rss MB":>11}')
+    for name, modules in cases:
+        timings, rss = zip(*(measure(modules) for _ in range(args.repeat)))
+        print(f'{name:>8} {min(timings):>10.1f} {min(rss):>11.1f}')
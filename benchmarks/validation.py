@@ -0,0 +1,39 @@
+"""
+POST /imports payload validation: marshmallow schema vs api/imports/validator.py.
+
+Usage:
+    python -m benchmarks.validation --citizens 10000 100000
+"""
+import argparse
+import copy
+import time
+
+from api.imports import schema, validator
+from benchmarks.insert import generate
+
+
+def timeit(import_schema, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        # marshmallow changes relatives of payload in place
+        data = copy.deepcopy(payload)
+        start = time.perf_counter()
+        _, errors = import_schema.load(data)
+        timings.append(time.perf_counter() - start)
+        assert not errors, errors
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--citizens', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--relatives', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"citizens":>10} {"marshmallow s":>14} {"fast s":>8}')
+    for citizens_cnt in args.citizens:
+        payload = {'citizens': generate(citizens_cnt, args.relatives)}
+        slow = timeit(schema.Import(), payload, args.repeat)
+        fast = timeit(validator.Import(), payload, args.repeat)
+        print(f'{citizens_cnt:>10} {slow:>14.3f} {fast:>8.3f}')
@@ -6,7 +6,7 @@ import settings
 
 def truncate(conn, schema='imports'):
     query = f'TRUNCATE TABLE {schema}.%s CASCADE'
-    for table in {'citizen', 'relation'}:
+    for table in {'citizen', 'relation', 'import', 'birthday', 'job', 'age_histogram'}:
         with conn.cursor() as cur:
             cur.execute(query % table)
 
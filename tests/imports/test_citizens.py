@@ -5,6 +5,8 @@ from psycopg2.extras import RealDictCursor
 
 from ..utils.post import TestGenPost
 from ..utils.patch import TestGenPatch
+from api.imports.resource import service
+from api.profiling import QueryProfiler
 
 
 post_gen = TestGenPost()
@@ -238,3 +240,20 @@ def test_patch_other_fields(client, import_id, field, val):
     rv = client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json={field: val})
     assert rv.status_code == 200
     assert rv.json['data'][field] == val
+
+
+@pytest.mark.parametrize('patch', [
+    {'town': 'Новый город', 'birth_date': '01.01.2000', 'relatives': [DATA['citizens'][1]['citizen_id']]},
+    {'birth_date': '01.01.2000'},
+    {'name': 'Иванов Петр'},
+])
+def test_patch_statements(client, monkeypatch, import_id, patch):
+    citizen_id = DATA['citizens'][0]['citizen_id']
+    rv = client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json={'relatives': []})
+    assert rv.status_code == 200
+
+    profiler = QueryProfiler()
+    monkeypatch.setattr(service._dbm, '_profiler', profiler)
+    rv = client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json=patch)
+    assert rv.status_code == 200
+    assert sum(stat['count'] for stat in profiler.stats.snapshot().values()) <= 3
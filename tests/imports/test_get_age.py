@@ -1,5 +1,11 @@
+from datetime import date, datetime
+
+import pytest
+
+from api.imports.age import full_years, next_age_change
 from ..utils.post import TestGenPost
 from ..utils.get_result import TestGetResult
+from ..utils.concurrent import patch_concurrently
 
 
 def test_get_age(client):
@@ -25,3 +31,106 @@ def test_get_age(client):
 def test_import_id_not_exist(client):
     rv = client.get(f'/imports/1/towns/stat/percentile/age')
     assert rv.status_code == 400
+
+
+REFERENCE_QUERY = """
+    select
+        town,
+        percentile_cont(0.5) within group (order by extract(year from age(birth_date))) as p50,
+        percentile_cont(0.75) within group (order by extract(year from age(birth_date))) as p75,
+        percentile_cont(0.99) within group (order by extract(year from age(birth_date))) as p99
+    from imports.citizen
+    where import_id = %s
+    group by town
+    order by town
+"""
+
+
+def test_age_matches_percentile_cont(client, conn):
+    data = TestGenPost().generate_valid_test(length=300)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    patches = [
+        {'town': 'Керчь'},
+        {'birth_date': '29.02.2000'},
+        {'town': 'Керчь', 'birth_date': '01.03.1950'},
+        {'town': data['citizens'][0]['town']},
+    ]
+    for citizen_info, patch in zip(data['citizens'][1:], patches):
+        rv = client.patch(f'/imports/{import_id}/citizens/{citizen_info["citizen_id"]}', json=patch)
+        assert rv.status_code == 200
+
+    rv = client.get(f'/imports/{import_id}/towns/stat/percentile/age')
+    assert rv.status_code == 200
+
+    with conn.cursor() as cur:
+        cur.execute(REFERENCE_QUERY, (import_id,))
+        expected = [dict(zip(('town', 'p50', 'p75', 'p99'), row)) for row in cur.fetchall()]
+    assert rv.json['data'] == expected
+
+
+@pytest.mark.parametrize('birth_date, today', [
+    (date(2000, 2, 29), date(2023, 2, 28)),
+    (date(2000, 2, 29), date(2023, 3, 1)),
+    (date(2000, 2, 29), date(2024, 2, 29)),
+    (date(1986, 12, 26), date(2019, 12, 25)),
+    (date(1986, 12, 26), date(2019, 12, 26)),
+])
+def test_full_years(conn, birth_date, today):
+    with conn.cursor() as cur:
+        cur.execute('select extract(year from age(%s, %s))::integer', (today, birth_date))
+        assert full_years(birth_date, today) == cur.fetchone()[0]
+
+
+@pytest.mark.parametrize('birth_dates, today, expected', [
+    ([date(1986, 12, 26), date(1990, 3, 5)], date(2019, 3, 5), date(2019, 12, 26)),
+    ([date(1986, 12, 26), date(1990, 3, 5)], date(2019, 12, 27), date(2020, 3, 5)),
+    ([date(2000, 2, 29)], date(2023, 1, 10), date(2023, 3, 1)),
+    ([date(2000, 2, 29)], date(2024, 1, 10), date(2024, 2, 29)),
+    ([date(2000, 2, 29), date(1990, 3, 1)], date(2023, 3, 1), date(2024, 2, 29)),
+    ([], date(2019, 1, 1), None),
+])
+def test_next_age_change(birth_dates, today, expected):
+    assert next_age_change(birth_dates, today) == expected
+
+
+def test_age_cached_until_next_birthday(client):
+    data = TestGenPost().generate_valid_test(length=50)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    rv = client.get(f'/imports/{import_id}/towns/stat/percentile/age')
+    etag = rv.headers['ETag']
+    birth_dates = [datetime.strptime(c['birth_date'], '%d.%m.%Y').date() for c in data['citizens']]
+    assert etag.endswith(f'{next_age_change(birth_dates, date.today())}"')
+
+    rv = client.get(f'/imports/{import_id}/towns/stat/percentile/age', headers={'If-None-Match': etag})
+    assert rv.status_code == 304
+    assert rv.headers['ETag'] == etag
+
+
+def test_age_histogram_concurrent_patches(client, conn):
+    data = TestGenPost().generate_valid_test(length=20)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    citizen_id = data['citizens'][0]['citizen_id']
+
+    patch_concurrently(
+        import_id, (citizen_id, {'town': 'Керчь'}), (citizen_id, {'town': 'Ялта', 'birth_date': '01.03.1950'})
+    )
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            select town, birth_date, citizens from imports.age_histogram
+            where import_id = %s and citizens > 0
+            order by town, birth_date
+        """, (import_id,))
+        histogram = cur.fetchall()
+        cur.execute("""
+            select town, birth_date, count(*) from imports.citizen
+            where import_id = %s
+            group by town, birth_date
+            order by town, birth_date
+        """, (import_id,))
+        assert histogram == cur.fetchall()
@@ -1,5 +1,6 @@
 from ..utils.post import TestGenPost
 from ..utils.get_result import TestGetResult
+from ..utils.concurrent import patch_concurrently
 
 
 def test_get_birthdays(client):
@@ -28,3 +29,81 @@ def test_get_birthdays(client):
 def test_import_id_not_exist(client):
     rv = client.get(f'/imports/1/citizens/birthdays')
     assert rv.status_code == 400
+
+
+def expected_birthdays(citizens):
+    months = {citizen['citizen_id']: int(citizen['birth_date'].split('.')[1]) for citizen in citizens}
+    res = {str(month): {} for month in range(1, 13)}
+    for citizen in citizens:
+        for relative in citizen['relatives']:
+            presents = res[str(months[relative])]
+            presents[citizen['citizen_id']] = presents.get(citizen['citizen_id'], 0) + 1
+
+    return {
+        month: [{'citizen_id': cid, 'presents': cnt} for cid, cnt in presents.items()]
+        for month, presents in res.items()
+    }
+
+
+def test_birthdays_after_patch(client):
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=30)
+
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    citizens = data['citizens']
+    first, second, third = citizens[0]['citizen_id'], citizens[1]['citizen_id'], citizens[2]['citizen_id']
+    patches = [
+        (first, {'birth_date': '01.03.2000'}),
+        (first, {'relatives': [second, third, first]}),
+        (second, {'relatives': [], 'birth_date': '15.07.1990'}),
+        (third, {'birth_date': '31.12.1980'}),
+    ]
+    for citizen_id, patch in patches:
+        rv = client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json=patch)
+        assert rv.status_code == 200
+
+    citizens = client.get(f'/imports/{import_id}/citizens').json['data']
+    rv = client.get(f'/imports/{import_id}/citizens/birthdays')
+
+    res = {
+        month: sorted(value, key=lambda x: x['citizen_id'])
+        for month, value in rv.json['data'].items()
+    }
+    expected = {
+        month: sorted(value, key=lambda x: x['citizen_id'])
+        for month, value in expected_birthdays(citizens).items()
+    }
+    assert res == expected
+
+
+def test_birthdays_concurrent_patches(client):
+    data = TestGenPost().generate_valid_test(length=30)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    first, second = data['citizens'][0], data['citizens'][1]
+    rv = client.patch(f'/imports/{import_id}/citizens/{first["citizen_id"]}', json={'relatives': []})
+    assert rv.status_code == 200
+
+    # relative is added while its birth date moves to another month
+    month = int(second['birth_date'].split('.')[1]) % 12 + 1
+    patch_concurrently(
+        import_id,
+        (first['citizen_id'], {'relatives': [second['citizen_id']]}),
+        (second['citizen_id'], {'birth_date': f'15.{month:02}.1990'})
+    )
+
+    citizens = client.get(f'/imports/{import_id}/citizens').json['data']
+    rv = client.get(f'/imports/{import_id}/citizens/birthdays')
+
+    res = {
+        month: sorted(value, key=lambda x: x['citizen_id'])
+        for month, value in rv.json['data'].items()
+    }
+    expected = {
+        month: sorted(value, key=lambda x: x['citizen_id'])
+        for month, value in expected_birthdays(citizens).items()
+    }
+    assert res == expected
@@ -1,4 +1,27 @@
+import pytest
+
 from ..utils.post import TestGenPost
+from api.cache import NullBackend
+from api.imports.resource import response_cache, service
+import settings
+
+
+@pytest.fixture
+def no_response_cache(monkeypatch):
+    """Same as RESPONSE_CACHE_BACKEND=none."""
+    monkeypatch.setattr(response_cache, '_backend', NullBackend())
+
+
+def _spy(monkeypatch, obj, name):
+    calls = []
+    method = getattr(obj, name)
+
+    def _wrapper(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, _wrapper)
+    return calls
 
 
 def test_get_citizens(client):
@@ -26,3 +49,105 @@ def test_import_id_not_exist(client):
     rv = client.get(f'/imports/1/citizens')
     assert rv.status_code == 400
 
+
+
+@pytest.mark.parametrize('copy_threshold', [0, 10 ** 6])
+def test_get_citizens_special_chars(client, monkeypatch, copy_threshold):
+    monkeypatch.setattr(settings, 'COPY_THRESHOLD', copy_threshold)
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=10)
+    for citizen, text in zip(data['citizens'], ['a\tb', 'a\nb', 'a\\b', '\\N', 'Льва Толстого', "a'b", 'a\rb']):
+        citizen['street'] = text
+
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    rv = client.get(f'/imports/{import_id}/citizens')
+
+    streets = {citizen['citizen_id']: citizen['street'] for citizen in rv.json['data']}
+    assert streets == {citizen['citizen_id']: citizen['street'] for citizen in data['citizens']}
+
+
+def test_get_citizens_cached(client):
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=10)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    citizen_id = data['citizens'][0]['citizen_id']
+
+    hits = response_cache.stats().get('hits', 0)
+    first = client.get(f'/imports/{import_id}/citizens')
+    second = client.get(f'/imports/{import_id}/citizens')
+    assert first.get_data() == second.get_data()
+    assert response_cache.stats()['hits'] == hits + 1
+
+    client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json={'town': 'Cached'})
+    rv = client.get(f'/imports/{import_id}/citizens')
+    towns = {citizen['citizen_id']: citizen['town'] for citizen in rv.json['data']}
+    assert towns[citizen_id] == 'Cached'
+
+
+def test_get_citizens_not_modified(client):
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=10)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    citizen_id = data['citizens'][0]['citizen_id']
+
+    rv = client.get(f'/imports/{import_id}/citizens')
+    etag = rv.headers['ETag']
+
+    rv = client.get(f'/imports/{import_id}/citizens', headers={'If-None-Match': etag})
+    assert rv.status_code == 304
+    assert rv.headers['ETag'] == etag
+    assert not rv.get_data()
+
+    client.patch(f'/imports/{import_id}/citizens/{citizen_id}', json={'town': 'Modified'})
+    rv = client.get(f'/imports/{import_id}/citizens', headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+
+
+def test_get_citizens_stream(client, monkeypatch, no_response_cache):
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=100)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    expected = client.get(f'/imports/{import_id}/citizens').json
+
+    monkeypatch.setattr(settings, 'CITIZENS_STREAM_THRESHOLD', 0)
+    monkeypatch.setattr(settings, 'CITIZENS_STREAM_ITERSIZE', 7)
+    calls = _spy(monkeypatch, service, 'iter_citizens')
+    rv = client.get(f'/imports/{import_id}/citizens')
+
+    assert rv.status_code == 200
+    assert [args[:2] for args in calls] == [(import_id, 7)]
+    assert rv.json == expected
+
+
+def test_get_citizens_postgres_json(client, monkeypatch, no_response_cache):
+    gen = TestGenPost()
+    data = gen.generate_valid_test(length=100)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+    expected = client.get(f'/imports/{import_id}/citizens').json
+
+    monkeypatch.setattr(settings, 'CITIZENS_JSON_MODE', 'postgres')
+    calls = _spy(monkeypatch, service, 'get_citizens_json')
+    rv = client.get(f'/imports/{import_id}/citizens')
+
+    assert rv.status_code == 200
+    assert [args[0] for args in calls] == [import_id]
+    assert rv.json == expected
+
+
+@pytest.mark.parametrize('path', ['citizens', 'citizens/birthdays', 'towns/stat/percentile/age'])
+def test_cache_miss_reads_import_once(client, monkeypatch, no_response_cache, path):
+    data = TestGenPost().generate_valid_test(length=10)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    calls = _spy(monkeypatch, service._dbm, 'get_import')
+    rv = client.get(f'/imports/{import_id}/{path}')
+
+    assert rv.status_code == 200
+    assert calls == [(import_id,)]
@@ -6,7 +6,7 @@ from ..utils.post import TestGenPost
 post_gen = TestGenPost()
 
 
-@pytest.mark.parametrize('data, exp_resp', [
+CASES = [
     (post_gen.generate_valid_test(length=10), 201),
     (post_gen.generate_broken_int(length=10, field='citizen_id'), 400),
     (post_gen.generate_broken_int(length=10, field='apartment'), 400),
@@ -48,7 +48,10 @@ post_gen = TestGenPost()
     (post_gen.generate_wrong_relations(length=10, mode='str'), 400),
     (post_gen.generate_wrong_relations(length=100, mode='negative'), 400),
     (post_gen.generate_wrong_relations(length=100, mode='repetitive'), 400),
-])
+]
+
+
+@pytest.mark.parametrize('data, exp_resp', CASES)
 def test_imports(client, data, exp_resp):
     print(data)
     rv = client.post('/imports', json=data)
@@ -60,3 +63,29 @@ def test_empty_payload(client):
     rv = client.post(f'/imports')
     print(rv.json)
     assert rv.status_code == 400
+
+
+def test_import_registered(client, conn):
+    data = post_gen.generate_valid_test(length=10)
+    rv = client.post('/imports', json=data)
+    import_id = rv.json['data']['import_id']
+
+    with conn.cursor() as cur:
+        cur.execute('select citizen_count, version from imports.import where import_id = %s', (import_id,))
+        res = cur.fetchone()
+
+    assert res == (len(data['citizens']), 0)
+
+
+def test_duplicated_citizen_keeps_import_id(client, conn):
+    with conn.cursor() as cur:
+        cur.execute('select last_value, is_called from imports.import_id')
+        sequence = cur.fetchone()
+
+    rv = client.post('/imports', json=post_gen.generate_duplicated_citizen_id(length=10))
+    assert rv.status_code == 400
+    assert rv.json['citizens'][0].startswith('citizen_id is duplicated')
+
+    with conn.cursor() as cur:
+        cur.execute('select last_value, is_called from imports.import_id')
+        assert cur.fetchone() == sequence
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from .test_imports import post_gen
+from api.imports.resource import import_jobs
+from api.pool import PoolTimeout
+
+
+def _wait(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        rv = client.get(f'/imports/jobs/{job_id}')
+        assert rv.status_code == 200
+        if rv.json['data']['state'] in ('done', 'failed') or time.monotonic() > deadline:
+            return rv.json['data']
+        time.sleep(0.05)
+
+
+def test_async_import(client):
+    data = post_gen.generate_valid_test(length=10)
+    rv = client.post('/imports?async', json=data)
+    assert rv.status_code == 202
+    job_id = rv.json['data']['job_id']
+    assert rv.headers['Location'].endswith(f'/imports/jobs/{job_id}')
+
+    job = _wait(client, job_id)
+    assert job['state'] == 'done'
+    assert job['citizens_validated'] == job['citizens_inserted'] == len(data['citizens'])
+    assert job['errors'] is None
+
+    rv = client.get(f'/imports/{job["import_id"]}/citizens')
+    assert rv.status_code == 200
+    assert len(rv.json['data']) == len(data['citizens'])
+
+
+def test_async_import_failed(client):
+    data = post_gen.generate_valid_test(length=10)
+    data['citizens'][3]['town'] = ''
+    rv = client.post('/imports?async&report', json=data)
+    assert rv.status_code == 202
+
+    job = _wait(client, rv.json['data']['job_id'])
+    assert job['state'] == 'failed'
+    assert job['import_id'] is None
+    assert job['errors']['errors'][0]['index'] == 3
+
+
+def test_job_not_found(client):
+    rv = client.get('/imports/jobs/0')
+    assert rv.status_code == 400
+
+
+class _FailingPool:
+    """Pool failing its `fail_on`-th checkout, counting connections not returned."""
+
+    def __init__(self, pool, fail_on):
+        self._pool = pool
+        self._fail_on = fail_on
+        self.checkouts = 0
+        self.out = 0
+
+    def getconn(self):
+        self.checkouts += 1
+        if self.checkouts == self._fail_on:
+            raise PoolTimeout('pool is exhausted')
+        self.out += 1
+        return self._pool.getconn()
+
+    def putconn(self, conn, close=False):
+        self.out -= 1
+        self._pool.putconn(conn, close)
+
+
+@pytest.mark.parametrize('fail_on', [2, 3])
+def test_async_import_no_connection(client, monkeypatch, fail_on):
+    # submit takes the 1st connection, job takes status and import connections
+    pool = _FailingPool(import_jobs._pool, fail_on=fail_on)
+    monkeypatch.setattr(import_jobs, '_pool', pool)
+    rv = client.post('/imports?async', json=post_gen.generate_valid_test(length=10))
+    assert rv.status_code == 202
+
+    job = _wait(client, rv.json['data']['job_id'])
+    assert job['state'] == 'failed'
+    assert 'pool is exhausted' in job['errors']['message']
+    # connections are returned right after state is committed
+    deadline = time.monotonic() + 5
+    while pool.out and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.out == 0
@@ -0,0 +1,77 @@
+import pytest
+
+from ..utils.citizen import make_citizen
+from api.imports.relations import RELATIVE_NOT_FOUND, NOT_TWO_SIDED, DUPLICATED_CITIZEN
+import settings
+
+
+BROKEN = {'citizens': [
+    make_citizen(citizen_id=1, relatives=[2]),
+    make_citizen(citizen_id=2, relatives=[1]),
+    make_citizen(citizen_id=3, relatives=[99], town=''),
+    make_citizen(citizen_id=3, relatives=[]),
+    make_citizen(citizen_id=5, relatives=[1]),
+    make_citizen(citizen_id=6, relatives=['x']),
+]}
+
+EXPECTED = [
+    {'index': 2, 'citizen_id': 3, 'field': 'town', 'reason': 'Field cannot be blank', 'relation': None},
+    {'index': 3, 'citizen_id': 3, 'field': 'citizen_id', 'reason': DUPLICATED_CITIZEN, 'relation': None},
+    {'index': 5, 'citizen_id': 6, 'field': 'relatives.0', 'reason': 'Not a valid integer.', 'relation': None},
+    {'index': 2, 'citizen_id': 3, 'field': 'relatives', 'reason': RELATIVE_NOT_FOUND, 'relation': [3, 99]},
+    {'index': 4, 'citizen_id': 5, 'field': 'relatives', 'reason': NOT_TWO_SIDED, 'relation': [5, 1]},
+]
+
+
+@pytest.fixture(params=['plain', 'stream'])
+def mode(request, monkeypatch):
+    if request.param == 'stream':
+        monkeypatch.setattr(settings, 'IMPORT_STREAM_THRESHOLD', 0)
+        monkeypatch.setattr(settings, 'IMPORT_STREAM_BATCH_SIZE', 2)
+
+
+def test_report(client, conn, mode):
+    rv = client.post('/imports?report', json=BROKEN)
+    assert rv.status_code == 400
+    assert rv.json == {'errors': EXPECTED, 'truncated': False}
+
+    with conn.cursor() as cur:
+        cur.execute('select count(*) from imports.citizen')
+        assert cur.fetchone()[0] == 0
+
+
+def test_report_limit(client, mode):
+    rv = client.post('/imports?report=2', json=BROKEN)
+    assert rv.status_code == 400
+    assert rv.json == {'errors': EXPECTED[:2], 'truncated': True}
+
+
+@pytest.mark.parametrize('limit', [-1, -100])
+def test_report_limit_at_least_one(client, conn, mode, limit):
+    rv = client.post(f'/imports?report={limit}', json=BROKEN)
+    assert rv.status_code == 400
+    assert rv.json == {'errors': EXPECTED[:1], 'truncated': True}
+
+    with conn.cursor() as cur:
+        cur.execute('select count(*) from imports.citizen')
+        assert cur.fetchone()[0] == 0
+
+
+def test_report_payload_errors(client, mode):
+    rv = client.post('/imports?report', json={'citizens': [], 'extra': 1})
+    assert rv.status_code == 400
+    assert rv.json['errors'][0]['index'] is None
+
+
+def test_report_valid(client, mode):
+    citizens = [make_citizen(citizen_id=1, relatives=[2]), make_citizen(citizen_id=2, relatives=[1])]
+    rv = client.post('/imports?report', json={'citizens': citizens})
+    assert rv.status_code == 201
+
+
+def test_report_blank(client, mode):
+    rv = client.post('/imports?report', json={'citizens': []})
+    assert rv.status_code == 400
+    assert rv.json['errors'] == [
+        {'index': None, 'citizen_id': None, 'field': 'citizens', 'reason': 'Field cannot be blank', 'relation': None}
+    ]
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from api.imports.stream import CitizensStream, PayloadError
+from .test_imports import CASES, post_gen
+import settings
+
+
+@pytest.fixture
+def stream_mode(monkeypatch):
+    monkeypatch.setattr(settings, 'IMPORT_STREAM_THRESHOLD', 0)
+    monkeypatch.setattr(settings, 'IMPORT_STREAM_BATCH_SIZE', 3)
+
+
+@pytest.mark.parametrize('data, exp_resp', CASES)
+def test_imports_stream(client, stream_mode, data, exp_resp):
+    rv = client.post('/imports', json=data)
+    print(rv.json)
+    assert rv.status_code == exp_resp
+
+
+def test_stream_rollback(client, conn, stream_mode):
+    data = post_gen.generate_valid_test(length=10)
+    data['citizens'][-1]['town'] = ''
+    rv = client.post('/imports', json=data)
+    assert rv.status_code == 400
+
+    with conn.cursor() as cur:
+        cur.execute('select count(*) from imports.citizen')
+        assert cur.fetchone()[0] == 0
+
+
+def test_stream_get_citizens(client, stream_mode):
+    data = post_gen.generate_valid_test(length=10)
+    rv = client.post('/imports', json=data)
+    assert rv.status_code == 201
+
+    rv = client.get(f'/imports/{rv.json["data"]["import_id"]}/citizens')
+    assert sorted(c['citizen_id'] for c in rv.json['data']) == \
+           sorted(c['citizen_id'] for c in data['citizens'])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_parser_chunks(chunk_size):
+    data = post_gen.generate_valid_test(length=10)
+    body = io.BytesIO(json.dumps(data, ensure_ascii=False).encode())
+    assert list(CitizensStream(body, chunk_size=chunk_size)) == data['citizens']
+
+
+@pytest.mark.parametrize('body', [
+    b'',
+    b'{}',
+    b'[]',
+    b'{"citizens": [{"citizen_id": 1}',
+    b'{"citizens": [], "extra": 1}',
+    b'{"citizens": []} []',
+])
+def test_parser_bad_payload(body):
+    with pytest.raises(PayloadError):
+        list(CitizensStream(io.BytesIO(body), chunk_size=4))
@@ -0,0 +1,90 @@
+import json
+import random
+
+import pytest
+
+from api.imports.dbm import DBManager
+from ..conftest import truncate
+from ..utils.citizen import make_citizen
+
+
+IMPORTS = 10
+CITIZENS = 2000
+TOWNS = ['Москва', 'Керчь', 'Самара', 'Тверь', 'Омск']
+
+
+def _generate(rnd):
+    citizens = [
+        make_citizen(
+            citizen_id=citizen_id,
+            town=rnd.choice(TOWNS),
+            birth_date=f'{rnd.randint(1, 28):02}.{rnd.randint(1, 12):02}.{rnd.randint(1940, 2015)}',
+            relatives=[]
+        )
+        for citizen_id in range(CITIZENS)
+    ]
+    for citizen_id in range(0, CITIZENS, 2):
+        relative = rnd.randrange(CITIZENS)
+        if relative != citizen_id and relative not in citizens[citizen_id]['relatives']:
+            citizens[citizen_id]['relatives'].append(relative)
+            citizens[relative]['relatives'].append(citizen_id)
+    return citizens
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    from api.app import connect_to_db
+    import settings
+
+    conn = connect_to_db(settings.DB_URI)
+    dbm = DBManager(conn)
+    rnd = random.Random(13)
+    import_ids = [dbm.insert_citizens(_generate(rnd))['import_id'] for _ in range(IMPORTS)]
+    conn.commit()
+
+    # as autovacuum would do, so that index only scans are possible
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('vacuum analyze imports.citizen')
+        cur.execute('vacuum analyze imports.relation')
+    conn.autocommit = False
+
+    yield conn, import_ids[len(import_ids) // 2]
+
+    truncate(conn)
+    conn.commit()
+    conn.close()
+
+
+def _plan_indexes(conn, query, values):
+    with conn.cursor() as cur:
+        cur.execute(f'explain (format json) {query}', values)
+        plan = cur.fetchone()[0]
+    text = json.dumps(plan)
+    return {node['Index Name'] for node in _nodes(plan[0]['Plan']) if 'Index Name' in node}, text
+
+
+def _nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _nodes(child)
+
+
+def test_citizens_plan(seeded):
+    conn, import_id = seeded
+    indexes, plan = _plan_indexes(conn, DBManager(conn)._citizens_query(), {'import_id': import_id})
+    assert 'relation_active_idx' in indexes, plan
+
+
+def test_birthdays_plan(seeded):
+    conn, import_id = seeded
+    dbm = DBManager(conn)
+    indexes, plan = _plan_indexes(conn, dbm._birthdays_query('r.import_id = %(import_id)s'), {'import_id': import_id})
+    assert 'relation_active_idx' in indexes, plan
+
+
+def test_age_histogram_plan(seeded):
+    conn, import_id = seeded
+    query = DBManager(conn)._age_histogram_query('import_id = %(import_id)s')
+    indexes, plan = _plan_indexes(conn, query, {'import_id': import_id})
+    assert 'citizen_town_birth_date_idx' in indexes, plan
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from api.imports import schema, validator
+from .test_imports import CASES
+from ..utils.citizen import BASE_CITIZEN, make_citizen
+
+
+def _payload(field, *values):
+    """Import of valid citizens differing by one value of `field` each."""
+    return {'citizens': [make_citizen(**{field: value}) for value in values]}
+
+
+EDGE_CASES = [
+    None, {}, [], 0, 'citizens', [1], {'x': 1},
+    {'citizens': None}, {'citizens': []}, {'citizens': 'ab'}, {'citizens': {}},
+    {'citizens': [None]}, {'citizens': [[]]}, {'citizens': [{}]},
+    {'citizens': [BASE_CITIZEN], 'x': 1, 'y': 2},
+    _payload('citizen_id', True, 5.7, ' 5'),
+    _payload('citizen_id', '5.0', [1], -1),
+    _payload('apartment', -1, True, ...),
+    _payload('relatives', [1.5], [True], ['2', 2]),
+    _payload('relatives', [-1, 'x', None], '12', {'a': 1}),
+    _payload('relatives', [-1, -1], [1, '01'], [' 1', 3]),
+    _payload('town', 5, '', ' ', None),
+    _payload('gender', 'x', '', 5),
+    _payload('birth_date', '1.2.2000', ' 1.2.2000', '31.02.2000'),
+    _payload('birth_date', '01.02.3000', '1.2.2000 ', '2000-01-01'),
+    _payload('birth_date', '00.01.2000', '01.01.0000', 5),
+    {'citizens': [make_citizen(foo=1, bar=2), make_citizen(name=..., foo=None)]},
+]
+
+
+def _normalize(result):
+    """Unknown field messages of marshmallow come from a set, so their order is random."""
+    if isinstance(result, dict):
+        return {key: _normalize(value) for key, value in result.items()}
+    if isinstance(result, list):
+        normalized = [_normalize(item) for item in result]
+        if all(isinstance(item, str) and item.startswith('Unknown field name') for item in normalized):
+            return sorted(normalized)
+        return normalized
+    return result
+
+
+def _load_both(schema_, validator_, payload):
+    # marshmallow stringifies relatives of the payload in place
+    expected = schema_.load(json.loads(json.dumps(payload)))
+    got = validator_.load(json.loads(json.dumps(payload)))
+    return _normalize(list(expected)), _normalize(list(got))
+
+
+@pytest.mark.parametrize('payload', [data for data, _ in CASES] + EDGE_CASES)
+def test_import_conformance(payload):
+    expected, got = _load_both(schema.Import(), validator.Import(), payload)
+    if expected[1]:
+        assert got[1] == expected[1]
+    else:
+        assert got == expected
+
+
+@pytest.mark.parametrize('citizen', EDGE_CASES[-12:])
+def test_citizen_conformance(citizen):
+    for citizen_info in citizen['citizens']:
+        expected, got = _load_both(schema.CitizenPost(), validator.CitizenPost(), citizen_info)
+        assert got[1] == expected[1]
+        if not expected[1]:
+            assert got == expected
+
+
+parallel_import = validator.Import(workers=2, parallel_threshold=1)
+
+
+@pytest.mark.parametrize('payload', [data for data, _ in CASES[:10]] + EDGE_CASES[-12:])
+def test_parallel_conformance(payload):
+    expected = validator.Import().load(json.loads(json.dumps(payload)))
+    assert parallel_import.load(json.loads(json.dumps(payload))) == expected
+
+
+def test_parallel_chunk_offsets():
+    citizens = [make_citizen(citizen_id=citizen_id) for citizen_id in range(20)]
+    citizens[3]['town'] = ''
+    citizens[17]['gender'] = 'x'
+    _, errors = parallel_import.load({'citizens': citizens})
+    assert set(errors['citizens']) == {3, 17}
+
+    citizens = [make_citizen(citizen_id=citizen_id % 15) for citizen_id in range(20)]
+    _, errors = parallel_import.load({'citizens': citizens})
+    assert errors == {'citizens': ['citizen_id is duplicated: citizen_id=0']}
+
+
+def test_spawn_executable(monkeypatch):
+    assert validator.spawn_executable('/opt/python') == '/opt/python'
+
+    monkeypatch.setattr(validator.sys, 'executable', '/venv/bin/uwsgi')
+    monkeypatch.setattr(validator.sys, 'exec_prefix', '/venv')
+    assert validator.spawn_executable() == '/venv/bin/python3'
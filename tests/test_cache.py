@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+from api.cache import LocalBackend, ResponseCache
+
+
+def test_lru_eviction():
+    backend = LocalBackend(max_bytes=10)
+    backend.set('a', b'1234')
+    backend.set('b', b'1234')
+    backend.get('a')
+    backend.set('c', b'1234')
+
+    assert backend.get('a') == b'1234'
+    assert backend.get('b') is None
+    assert backend.get('c') == b'1234'
+    assert backend.stats()['evictions'] == 1
+    assert backend.stats()['bytes'] == 8
+
+
+def test_too_large_value_skipped():
+    backend = LocalBackend(max_bytes=3)
+    backend.set('a', b'1234')
+    assert backend.get('a') is None
+
+
+def test_invalidate_and_counters():
+    cache = ResponseCache(LocalBackend(max_bytes=1024))
+    cache.register('citizens')
+    cache.register('age', expiring=True)
+
+    for endpoint in ('citizens', 'age'):
+        cache.set(endpoint, 1, 0, b'data')
+        assert cache.get(endpoint, 1, 0) == b'data'
+        assert cache.get(endpoint, 1, 1) is None
+
+    cache.invalidate(1, 0)
+    assert cache.get('citizens', 1, 0) is None
+    assert cache.get('age', 1, 0) is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 4
+    assert stats['items'] == 0
+
+
+def test_expiring_entries():
+    cache = ResponseCache(LocalBackend(max_bytes=1024))
+    cache.register('age', expiring=True)
+    tomorrow = date.today() + timedelta(days=1)
+
+    cache.set('age', 1, 0, b'data', valid_until=tomorrow)
+    assert cache.get_until('age', 1, 0) == (b'data', tomorrow)
+
+    cache.set('age', 1, 0, b'data', valid_until=date.today())
+    assert cache.get_until('age', 1, 0) == (None, None)
+    assert cache.stats()['items'] == 0
+
+    cache.set('age', 2, 0, b'data')
+    assert cache.get_until('age', 2, 0) == (b'data', date.max)
@@ -0,0 +1,55 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from api.json_provider import load_backend
+
+
+def _backends():
+    for name in ('orjson', 'ujson', 'json'):
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        yield name
+
+
+DOCUMENT = {
+    'data': [{'citizen_id': 1, 'name': 'Иван / "Ivan"', 'relatives': [2, 3]}],
+    'date': date(1986, 12, 26),
+    'datetime': datetime(2019, 8, 20, 10, 30),
+    'percentile': Decimal('27.5'),
+    'errors': {0: {'name': ['Field may not be null.']}}
+}
+
+
+@pytest.mark.parametrize('name', list(_backends()))
+def test_same_output(name):
+    _, dumps, loads = load_backend(name)
+    _, json_dumps, _ = load_backend('json')
+
+    body = dumps(DOCUMENT)
+    assert isinstance(body, bytes)
+    assert json.loads(body) == json.loads(json_dumps(DOCUMENT))
+    assert json.loads(body) == {
+        'data': [{'citizen_id': 1, 'name': 'Иван / "Ivan"', 'relatives': [2, 3]}],
+        'date': 'Fri, 26 Dec 1986 00:00:00 GMT',
+        'datetime': 'Tue, 20 Aug 2019 10:30:00 GMT',
+        'percentile': 27.5,
+        'errors': {'0': {'name': ['Field may not be null.']}}
+    }
+    assert loads(body)['data'] == DOCUMENT['data']
+
+
+@pytest.mark.parametrize('name', list(_backends()))
+def test_bad_json(name):
+    _, _, loads = load_backend(name)
+    with pytest.raises(ValueError):
+        loads(b'{"citizens": [')
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend('simplejson')
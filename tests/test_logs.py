@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+
+import pytest
+
+from api.logs import InfoSamplingFilter, WorkerQueueHandler, setup_logging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.getMessage(), record.process))
+
+
+def _wait(handler, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(handler.records) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue_logger():
+    target = ListHandler()
+    handler = WorkerQueueHandler((target,))
+    logger = logging.getLogger('tests.logs')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    yield logger, handler, target
+    logger.removeHandler(handler)
+
+
+def test_records_formatted_by_listener(queue_logger):
+    logger, _, target = queue_logger
+
+    class Lazy:
+        def __str__(self):
+            return 'formatted'
+
+    logger.info('value=%s', Lazy())
+    _wait(target, 1)
+    assert target.records == [('value=formatted', os.getpid())]
+
+
+def test_listener_restarted_after_fork(queue_logger):
+    logger, handler, target = queue_logger
+    logger.info('parent')
+    _wait(target, 1)
+
+    # forked process keeps handler attributes, but not listener thread
+    handler._pid = -1
+    logger.info('child')
+    _wait(target, 2)
+    assert [message for message, _ in target.records] == ['parent', 'child']
+    assert handler._pid == os.getpid()
+
+
+@pytest.mark.parametrize('level, rate, passed', [
+    (logging.INFO, 0, False),
+    (logging.DEBUG, 0, False),
+    (logging.WARNING, 0, True),
+    (logging.INFO, 1, True),
+])
+def test_info_sampling(level, rate, passed):
+    record = logging.LogRecord('tests', level, __file__, 0, 'message', (), None)
+    assert InfoSamplingFilter(rate).filter(record) is passed
+
+
+def test_setup_logging_moves_handlers_to_queue(tmp_path):
+    config = tmp_path / 'logging.conf'
+    config.write_text('\n'.join([
+        '[loggers]', 'keys=root,sampled',
+        '[handlers]', 'keys=nullHandler',
+        '[formatters]', 'keys=',
+        '[logger_root]', 'level=WARNING', 'handlers=nullHandler',
+        '[logger_sampled]', 'level=INFO', 'handlers=nullHandler', 'qualname=tests.sampled', 'propagate=0',
+        '[handler_nullHandler]', 'class=NullHandler', 'args=()',
+    ]))
+    root = logging.getLogger()
+    # fileConfig resets loggers it does not configure
+    loggers = [root] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+    state = [(logger, logger.handlers[:], logger.level, logger.propagate, logger.disabled) for logger in loggers]
+    try:
+        setup_logging(str(config), info_sample_rate=0.5)
+        sampled = logging.getLogger('tests.sampled')
+
+        assert len(sampled.handlers) == 1
+        assert isinstance(sampled.handlers[0], WorkerQueueHandler)
+        # loggers with the same handlers share listener
+        assert sampled.handlers[0] in root.handlers
+        assert isinstance(sampled.handlers[0].filters[0], InfoSamplingFilter)
+    finally:
+        for logger, handlers, level, propagate, disabled in state:
+            logger.handlers[:] = handlers
+            logger.setLevel(level)
+            logger.propagate, logger.disabled = propagate, disabled
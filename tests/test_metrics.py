@@ -0,0 +1,67 @@
+from prometheus_client import REGISTRY
+
+from api import metrics
+from tests.imports.test_imports import post_gen
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_metrics(client):
+    data = post_gen.generate_valid_test(length=10)
+    labels = {'route': 'imports', 'method': 'POST'}
+    requests = _sample('http_requests_total', status='201', **labels)
+    db_seconds = _sample('http_request_db_seconds_sum', **labels)
+    validations = _sample('import_validation_seconds_count', mode='body')
+    acquires = _sample('db_connection_acquire_seconds_count')
+
+    rv = client.post('/imports', json=data)
+    assert rv.status_code == 201
+
+    assert _sample('http_requests_total', status='201', **labels) == requests + 1
+    assert _sample('http_request_db_seconds_sum', **labels) > db_seconds
+    assert _sample('http_request_size_bytes_count', **labels) >= 1
+    assert _sample('http_response_size_bytes_count', **labels) >= 1
+    assert _sample('import_validation_seconds_count', mode='body') == validations + 1
+    assert _sample('db_connection_acquire_seconds_count') == acquires + 1
+    assert _sample('http_requests_in_flight') == 0
+
+
+def test_routes_named_by_view(client):
+    before = _sample('http_requests_total', route='citizen_collection', method='GET', status='400')
+    assert client.get('/imports/1/citizens').status_code == 400
+    assert _sample('http_requests_total', route='citizen_collection', method='GET', status='400') == before + 1
+
+
+def test_validation_timer():
+    timer = metrics.ValidationTimer(lambda citizen: (citizen, {}), 'stream')
+    assert timer({'citizen_id': 1}) == ({'citizen_id': 1}, {})
+    assert timer.seconds > 0
+
+    before = _sample('import_validation_seconds_count', mode='stream')
+    timer.observe()
+    assert _sample('import_validation_seconds_count', mode='stream') == before + 1
+
+
+def test_metrics_endpoint(client):
+    acquires = _sample('db_connection_acquire_seconds_count')
+    rv = client.get('/metrics')
+    assert rv.status_code == 200
+    assert rv.content_type.startswith('text/plain')
+    assert b'http_request_duration_seconds_bucket' in rv.data
+    # /metrics does not take database connection
+    assert _sample('db_connection_acquire_seconds_count') == acquires
+
+
+def test_response_cache_metrics(client):
+    data = post_gen.generate_valid_test(length=10)
+    import_id = client.post('/imports', json=data).get_json()['data']['import_id']
+    misses, hits = _sample('response_cache_misses_total'), _sample('response_cache_hits_total')
+
+    client.get(f'/imports/{import_id}/citizens')
+    client.get(f'/imports/{import_id}/citizens')
+
+    assert _sample('response_cache_misses_total') == misses + 1
+    assert _sample('response_cache_hits_total') == hits + 1
+    assert b'response_cache_items' in client.get('/metrics').data
@@ -0,0 +1,77 @@
+import psycopg2
+import pytest
+
+from api.pool import ConnectionPool, PoolTimeout
+import settings
+
+
+@pytest.fixture
+def pool():
+    pool_ = ConnectionPool(settings.DB_URI, min_size=1, max_size=2, timeout=0.1)
+    yield pool_
+    pool_.closeall()
+
+
+def test_reuse_connection(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+
+
+def test_pool_exhausted(pool):
+    conns = [pool.getconn() for _ in range(2)]
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    for conn in conns:
+        pool.putconn(conn)
+    assert pool.size == 1
+
+
+def test_broken_connection_replaced(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.close()
+
+    new_conn = pool.getconn()
+    assert new_conn is not conn
+    assert not new_conn.closed
+
+
+def test_expired_connection_replaced():
+    pool = ConnectionPool(settings.DB_URI, max_lifetime=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.size == 0
+
+
+def _terminate(conn):
+    other = psycopg2.connect(settings.DB_URI)
+    other.autocommit = True
+    with other.cursor() as cur:
+        cur.execute('select pg_terminate_backend(%s)', (conn.get_backend_pid(),))
+    other.close()
+
+
+def test_idle_connection_pinged():
+    pool = ConnectionPool(settings.DB_URI, check_idle=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    _terminate(conn)
+
+    new_conn = pool.getconn()
+    assert new_conn is not conn
+    pool.putconn(new_conn)
+    pool.closeall()
+
+
+def test_recently_used_connection_not_pinged():
+    pool = ConnectionPool(settings.DB_URI, check_idle=3600)
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    pool.putconn(conn)
+    pool.closeall()
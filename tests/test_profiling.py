@@ -0,0 +1,92 @@
+import io
+import logging
+
+from psycopg2.extras import RealDictCursor
+
+from api.app import pool
+from api.imports.dbm import DBManager
+from api.profiling import QueryProfiler, QueryStats
+from tests.imports.test_imports import post_gen
+
+
+def test_stats_buckets_are_cumulative():
+    stats = QueryStats(buckets=(0.1, 1))
+    stats.add('q', 0.05, 1, 10)
+    stats.add('q', 0.5, 2, 10)
+    stats.add('q', 5, 3, 10)
+
+    res = stats.snapshot()['q']
+    assert res['count'] == 3
+    assert res['rows'] == 6
+    assert res['bytes'] == 30
+    assert res['buckets'] == {'0.1': 1, '1': 2, '+Inf': 3}
+
+
+def test_queries_recorded_by_method(conn):
+    profiler = QueryProfiler()
+    dbm = DBManager(conn, profiler=profiler)
+    dbm.get_next_import_id()
+    dbm.get_next_import_id()
+
+    res = profiler.stats.snapshot()['get_next_import_id']
+    assert res['count'] == 2
+    assert res['rows'] == 2
+    assert res['bytes'] > 0
+
+
+def test_copy_bytes_recorded(conn):
+    profiler = QueryProfiler()
+    with profiler.cursor(conn, 'copy') as cur:
+        cur.execute('create temp table profiling_copy (value integer)')
+        cur.copy_expert('copy profiling_copy from stdin', io.StringIO('1\n2\n3\n'))
+
+    res = profiler.stats.snapshot()['copy']
+    assert res['count'] == 2
+    assert res['rows'] == 3
+    assert res['bytes'] >= 6
+
+
+def test_slow_query_logged_with_plan(conn, caplog):
+    profiler = QueryProfiler(slow_seconds=0, explain=True)
+    with caplog.at_level(logging.WARNING, logger='api.profiling'):
+        with profiler.cursor(conn, 'slow', cursor_factory=RealDictCursor) as cur:
+            cur.execute('select %(value)s as value', {'value': 1})
+            assert cur.fetchone() == {'value': 1}
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0].startswith('slow query name=slow')
+    assert messages[1].startswith('slow query plan name=slow')
+    assert 'actual time' in messages[1]
+
+
+def test_slow_query_plan_not_applied(conn):
+    profiler = QueryProfiler(slow_seconds=0, explain=True)
+    with profiler.cursor(conn, 'slow') as cur:
+        cur.execute('create temp table profiling_explain (value integer)')
+        cur.execute('with inserted as (insert into profiling_explain values (1) returning value) select * from inserted')
+        cur.execute('select count(*) from profiling_explain')
+        assert cur.fetchone() == (1,)
+
+
+def test_query_stats_endpoint(client, monkeypatch):
+    client.get('/imports/1/citizens')
+
+    def getconn():
+        raise AssertionError('connection is taken')
+
+    monkeypatch.setattr(pool, 'getconn', getconn)
+    resp = client.get('/stats/queries')
+    assert resp.status_code == 200
+    assert resp.get_json()['get_import']['count'] >= 1
+
+
+def test_server_side_cursor_profiled(client, conn):
+    data = post_gen.generate_valid_test(length=10)
+    import_id = client.post('/imports', json=data).get_json()['data']['import_id']
+
+    profiler = QueryProfiler()
+    citizens = list(DBManager(conn, profiler=profiler).iter_citizens(import_id, itersize=3))
+
+    assert sorted(citizen['citizen_id'] for citizen in citizens) == \
+        sorted(citizen['citizen_id'] for citizen in data['citizens'])
+    assert profiler.stats.snapshot()['iter_citizens']['count'] == 1
@@ -0,0 +1,18 @@
+BASE_CITIZEN = {
+    'citizen_id': 1,
+    'town': 'Москва',
+    'street': 'Льва Толстого',
+    'building': '16к7стр5',
+    'apartment': 7,
+    'name': 'Иванов Иван Иванович',
+    'birth_date': '26.12.1986',
+    'gender': 'male',
+    'relatives': []
+}
+
+
+def make_citizen(**fields):
+    """Valid citizen with given fields replaced, fields set to ... are dropped."""
+    # relatives list is not shared between citizens
+    citizen = {**BASE_CITIZEN, 'relatives': [], **fields}
+    return {key: value for key, value in citizen.items() if value is not ...}
@@ -0,0 +1,36 @@
+import threading
+
+from api.app import connect_to_db
+from api.imports.dbm import DBManager
+from api.imports.service import Service
+import settings
+
+
+def patch_concurrently(import_id, first, second):
+    """
+    Apply PATCHes given as (citizen_id, citizen_upd) in their own transactions:
+    second one is started while first one is not committed yet and has to wait for it.
+    """
+    conns = [connect_to_db(settings.DB_URI) for _ in range(2)]
+    errors = []
+
+    def patch_second():
+        try:
+            Service(dbm=DBManager(conns[1])).patch_citizen(import_id, *second)
+            conns[1].commit()
+        except Exception as err:
+            errors.append(err)
+
+    try:
+        Service(dbm=DBManager(conns[0])).patch_citizen(import_id, *first)
+        thread = threading.Thread(target=patch_second)
+        thread.start()
+        thread.join(timeout=0.5)
+        assert thread.is_alive(), 'second PATCH does not wait for the first one'
+        conns[0].commit()
+        thread.join()
+    finally:
+        for conn in conns:
+            conn.rollback()
+            conn.close()
+    assert not errors, errors